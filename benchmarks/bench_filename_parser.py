@@ -0,0 +1,135 @@
+"""
+bench_filename_parser.py
+
+对比 filename_parser 与旧版 yield_info 中逐条 re.findall 的解析速度（文件/秒）。
+
+    python benchmarks/bench_filename_parser.py [文件数]
+"""
+
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from filename_parser import PARSER  # pylint: disable=wrong-import-position
+
+
+def legacy_parse(stem: str) -> dict[str, Any]:
+    """
+    旧版 yield_info 的循环体，每次调用都重新构建规则表。
+    """
+    time_case: list[tuple[str, str]] = [
+        (r"20\d{2}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2}", "%Y-%m-%d-%H-%M-%S"),
+        (r"20\d{12}", "%Y%m%d%H%M%S"),
+    ]
+    weather_case: list[tuple[str, str, str]] = [
+        (r"(?:[阴晴雨雪雾]|多云)[天]?\-?\d{1,2}$", r"[阴晴雨雪雾]|多云", r"\d{1,2}$")
+    ]
+    image_case: list[tuple[str, str]] = [
+        (r"^IR", "IR"),
+        (r"^DJI_\d+_\d+_T", "IR"),
+        (r"^GREY_", "NR"),
+        (r"^DJI_\d+_\d+_V", "NR"),
+        (r"^DJI_\d+_\d+_S", "NR"),
+    ]
+
+    time_stamp: str = ""
+    weather_str: str = ""
+    temperature_str: str = ""
+    img_type: str = ""
+
+    for pattern, time_format in time_case:
+        re_result: list[str] = re.findall(pattern=pattern, string=stem)
+        if not re_result:
+            continue
+        try:
+            time_obj: datetime = datetime.strptime(re_result[0], time_format)
+        except ValueError:
+            continue
+        time_stamp = time_obj.strftime("%Y-%m-%d %H:%M:%S")
+        break
+
+    for total, w_pattern, t_pattern in weather_case:
+        re_result = re.findall(pattern=total, string=stem)
+        if not re_result:
+            continue
+        weather_str = re.findall(pattern=w_pattern, string=re_result[0])[0]
+        temperature_str = re.findall(pattern=t_pattern, string=re_result[0])[0]
+        break
+
+    for pattern, itype in image_case:
+        re_result = re.findall(pattern=pattern, string=stem)
+        if not re_result:
+            continue
+        img_type = itype
+        break
+
+    return {
+        "time_stamp": time_stamp,
+        "weather": weather_str,
+        "temperature": temperature_str,
+        "img_type": img_type,
+    }
+
+
+def make_stems(count: int) -> list[str]:
+    """
+    生成模拟的 DJI/IR/GREY 文件名，包含少量非法日期。
+    """
+    rng: random.Random = random.Random(0)
+    stems: list[str] = []
+    for i in range(count):
+        month: int = rng.randint(1, 13)
+        day: int = rng.randint(1, 31)
+        clock: str = "".join(f"{rng.randint(0, 59) % m:02d}" for m in (24, 60, 60))
+        digits: str = f"2023{month:02d}{day:02d}{clock}"
+        kind: int = i % 5
+        if kind == 0:
+            stems.append(f"DJI_{digits}_{i:04d}_V")
+        elif kind == 1:
+            stems.append(f"DJI_{digits}_{i:04d}_T")
+        else:
+            dashed: str = "-".join(
+                [digits[0:4]] + [digits[i : i + 2] for i in range(4, 14, 2)]
+            )
+            prefix: str = "IR" if kind == 2 else "GREY"
+            weather: str = rng.choice(["晴", "阴", "多云", "雨"])
+            stems.append(f"{prefix}_{dashed}_{weather}{rng.randint(0, 35)}")
+    return stems
+
+
+def bench(name: str, func: Callable[[str], dict[str, Any]], stems: list[str]) -> float:
+    """
+    返回每秒解析的文件数。
+    """
+    start: float = time.perf_counter()
+    for stem in stems:
+        func(stem)
+    elapsed: float = time.perf_counter() - start
+    rate: float = len(stems) / elapsed
+    print(f"{name:<16}{rate:>14,.0f} 文件/秒")
+    return rate
+
+
+def main() -> None:
+    """
+    主函数。
+    """
+    count: int = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    stems: list[str] = make_stems(count)
+
+    mismatches: int = sum(1 for s in stems if legacy_parse(s) != PARSER.parse(s))
+    print(f"{count} 个文件名，结果不一致：{mismatches}")
+
+    legacy: float = bench("legacy", legacy_parse, stems)
+    current: float = bench("filename_parser", PARSER.parse, stems)
+    print(f"加速比：{current / legacy:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+bench_memory.py
+
+统计每 10 万条记录的内存占用：
+旧版基于 __dict__ 的 PicData/Pair、__slots__ 版本的 Pair，以及列式存储 PairColumns。
+
+    python benchmarks/bench_memory.py [记录数]
+"""
+
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from get_file import Pair, PairColumns, PicData
+
+
+class LegacyPicData:  # pylint: disable=too-many-instance-attributes
+    """
+    旧版 PicData 的属性布局。
+    """
+
+    def __init__(self) -> None:
+        self.time_stamp: str = ""
+        self._weather: Any = None
+        self._temperature: Any = None
+        self.feature: Any = None
+        self.shooting_position: tuple[float, float] = (0.0, 0.0)
+        self.wind_dir: str = ""
+        self.wind_scale: int = 0
+        self.wind_speed: int = 0
+        self.humidity: int = 0
+        self.precip: float = 0.0
+        self.pressure: int = 0
+        self.vis: int = 0
+        self.cloud: int = 0
+        self.AS: float = 0.0  # pylint: disable=invalid-name
+        self.HS: float = 0.0  # pylint: disable=invalid-name
+
+
+class LegacyPair:
+    """
+    旧版 Pair 的属性布局。
+    """
+
+    def __init__(self) -> None:
+        self.original: Path = Path()
+        self.processed: Path = Path()
+        self.data: LegacyPicData = LegacyPicData()
+
+
+def make_rows(count: int) -> list[tuple]:
+    """
+    生成与数据库记录格式一致的行。
+    """
+    rng: random.Random = random.Random(0)
+    rows: list[tuple] = []
+    for i in range(count):
+        stamp: str = f"20230615{i:06d}"
+        feature: list[str] = rng.sample(PicData.FEATURE_TYPE, rng.randint(0, 3))
+        rows.append(
+            (
+                i + 1,
+                f"images/flight{i // 500:04d}/DJI_{stamp}_{i:04d}_V.JPG",
+                f"images/flight{i // 500:04d}/DJI_{stamp}_{i:04d}_T.JPG",
+                f"2023-06-15 {i % 24:02d}:{i % 60:02d}:{i % 60:02d}",
+                feature,
+                (113.0 + rng.random(), 23.0 + rng.random()),
+                rng.choice(["北风", "东风", "南风", "西风"]),
+                rng.randint(0, 6),
+                rng.randint(0, 20),
+                rng.randint(20, 100),
+                rng.random() * 10,
+                rng.randint(990, 1030),
+                rng.randint(1000, 30000),
+                rng.randint(0, 100),
+                0.0,
+                0.0,
+                rng.choice(["sunny", "cloudy", "rainy"]),
+                rng.randint(-10, 40),
+            )
+        )
+    return rows
+
+
+def build_legacy(rows: list[tuple]) -> list[LegacyPair]:
+    """
+    构造旧版 Pair 列表。
+    """
+    pairs: list[LegacyPair] = []
+    for row in rows:
+        pair: LegacyPair = LegacyPair()
+        pair.original = Path(row[1])
+        pair.processed = Path(row[2])
+        data: LegacyPicData = pair.data
+        data.time_stamp = row[3]
+        data.feature = list(row[4])
+        data.shooting_position = tuple(row[5])  # type: ignore
+        data.wind_dir = row[6]
+        data.wind_scale = row[7]
+        data.wind_speed = row[8]
+        data.humidity = row[9]
+        data.precip = row[10]
+        data.pressure = row[11]
+        data.vis = row[12]
+        data.cloud = row[13]
+        data.AS = row[14]
+        data.HS = row[15]
+        data._weather = row[16]  # pylint: disable=protected-access
+        data._temperature = row[17]  # pylint: disable=protected-access
+        pairs.append(pair)
+    return pairs
+
+
+def iter_slots(rows: list[tuple]) -> Iterator[Pair]:
+    """
+    逐个构造 __slots__ 版本的 Pair。
+    """
+    for row in rows:
+        pair: Pair = Pair()
+        pair.id = row[0]
+        pair.original = row[1]
+        pair.processed = row[2]
+        data: PicData = pair.data
+        data.time_stamp = row[3]
+        data.feature = row[4]
+        data.shooting_position = row[5]
+        data.wind_dir = row[6]
+        data.wind_scale = row[7]
+        data.wind_speed = row[8]
+        data.humidity = row[9]
+        data.precip = row[10]
+        data.pressure = row[11]
+        data.vis = row[12]
+        data.cloud = row[13]
+        data.AS = row[14]
+        data.HS = row[15]
+        data.weather = row[16]
+        data.temperature = row[17]
+        yield pair
+
+
+def build_slots(rows: list[tuple]) -> list[Pair]:
+    """
+    构造 __slots__ 版本的 Pair 列表。
+    """
+    return list(iter_slots(rows))
+
+
+def build_columns(rows: list[tuple]) -> PairColumns:
+    """
+    构造列式存储。
+    """
+    return PairColumns(iter_slots(rows))
+
+
+def measure(build: Callable[[list[tuple]], Any], rows: list[tuple]) -> float:
+    """
+    返回构造结果在 tracemalloc 下的内存占用（MiB）。
+    """
+    tracemalloc.start()
+    result: Any = build(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / 1024 / 1024
+
+
+def main() -> None:
+    """
+    主函数。
+    """
+    count: int = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows: list[tuple] = make_rows(count)
+    scale: float = 100_000 / count
+
+    legacy: float = measure(build_legacy, rows) * scale
+    print(f"{count} 条记录，按每 10 万条换算：")
+    print(f"{'legacy __dict__':<18}{legacy:>10.1f} MiB")
+    for name, build in (("__slots__", build_slots), ("PairColumns", build_columns)):
+        used: float = measure(build, rows) * scale
+        print(f"{name:<18}{used:>10.1f} MiB  节省 {1 - used / legacy:.0%}")
+
+
+if __name__ == "__main__":
+    main()
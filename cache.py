@@ -0,0 +1,73 @@
+"""
+cache.py
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    线程安全的 LRU 缓存，记录命中和未命中次数。
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size: int = max_size
+        "最大条目数"
+
+        self.hits: int = 0
+        "命中次数"
+
+        self.misses: int = 0
+        "未命中次数"
+
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        返回缓存的值并将其标记为最近使用，不存在时返回 None。
+        """
+        with self._lock:
+            value: Optional[V] = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        """
+        写入缓存，超出容量时淘汰最久未使用的条目。
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: K) -> Optional[V]:
+        """
+        移除并返回缓存的值，不存在时返回 None。
+        """
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        清空缓存。
+        """
+        with self._lock:
+            self._data.clear()
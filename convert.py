@@ -3,110 +3,776 @@ convert.py
 """
 
 import json
+import re
 import sqlite3
+import time
 from pathlib import Path
-from typing import Any
+from typing import IO, Any, Callable, Generator, Iterable, Literal, Optional
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 为可选依赖，只有 convert_to_arrow 和 read_arrow 需要
+    pa = None
 
-def convert_to_sqlite(data_file: Path, database_file: Path) -> None:
+COLUMNS: tuple[str, ...] = (
+    "original",
+    "processed",
+    "time_stamp",
+    "feature",
+    "shooting_position",
+    "wind_dir",
+    "wind_scale",
+    "wind_speed",
+    "humidity",
+    "precip",
+    "pressure",
+    "vis",
+    "cloud",
+    "AS",
+    "HS",
+    "weather",
+    "temperature",
+)
+"records 表中除 id 外的数据列，顺序与 Pair.load_from_tuple 一致"
+
+CREATE_TABLE_SQL: str = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    original TEXT,
+    processed TEXT,
+    time_stamp TEXT,
+    feature TEXT,
+    shooting_position TEXT,
+    wind_dir TEXT,
+    wind_scale INTEGER,
+    wind_speed INTEGER,
+    humidity INTEGER,
+    precip REAL,
+    pressure INTEGER,
+    vis INTEGER,
+    cloud INTEGER,
+    `AS` REAL,
+    `HS` REAL,
+    weather TEXT,
+    temperature REAL
+)
+"""
+
+PROCESSED_INDEX_SQL: str = (
+    "CREATE INDEX IF NOT EXISTS idx_records_processed ON records (processed)"
+)
+
+CREATE_INDEX_SQL: tuple[str, ...] = (
+    PROCESSED_INDEX_SQL,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_records_original ON records (original)",
+    "CREATE INDEX IF NOT EXISTS idx_records_time_stamp ON records (time_stamp)",
+)
+
+SELECT_COLUMNS: str = ", ".join(f"`{c}`" for c in COLUMNS)
+"用于 SELECT 的 COLUMNS 列表"
+
+_ENCODER: json.JSONEncoder = json.JSONEncoder(ensure_ascii=False)
+
+UNSET_VALUES: dict[str, Any] = {"shooting_position": _ENCODER.encode([0.0, 0.0])}
+"各列未设置时在数据库中的值，用于 merge_to_sqlite 的 fill_columns"
+
+INSERT_SQL: str = f"""
+INSERT INTO records ({SELECT_COLUMNS})
+VALUES ({", ".join("?" for _ in COLUMNS)})
+"""
+
+
+class _JsonStream:
     """
-    将JSON数据转换为SQLite数据库
+    JSON 流式读取器。
+    按块读取文件，逐个解析数组元素，避免将整个文件读入内存。
+    """
+
+    WHITESPACE: re.Pattern[str] = re.compile(r"[ \t\n\r]*")
+    NUMBER_CHARS: str = "0123456789.eE+-"
+    SEPARATOR: re.Pattern[str] = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+
+    def __init__(self, f: IO[str], chunk_size: int) -> None:
+        self.f: IO[str] = f
+        self.chunk_size: int = chunk_size
+        self.buffer: str = ""
+        self.pos: int = 0
+        self.eof: bool = False
+        self.decoder: json.JSONDecoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk: str = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        跳过空白字符，返回下一个字符，文件结束时返回空字符串。
+        """
+        while True:
+            self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()  # type: ignore
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        """
+        读取下一个字符并检查是否为 char。
+        """
+        if self.peek() != char:
+            raise ValueError(f"JSON 格式错误：位置 {self.pos} 处应为 {char!r}")
+        self.pos += 1
+
+    def decode(self) -> Any:
+        """
+        解析下一个完整的 JSON 值。
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # 数字可能被块边界截断（如 "2.5" 只读到 "2."），需要确认后面是数字以外的字符
+            if (
+                end == len(self.buffer) or self.buffer[end] in self.NUMBER_CHARS
+            ) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self) -> Generator[Any, Any, None]:
+        """
+        逐个返回数组中的元素。
+        元素及其后的分隔符都在缓冲区内时直接解析，否则回退到逐步读取。
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        scan_once: Callable[[str, int], tuple[Any, int]] = self.decoder.scan_once
+        separator: re.Pattern[str] = self.SEPARATOR
+        while True:
+            buffer: str = self.buffer
+            try:
+                value, end = scan_once(buffer, self.pos)
+            except (StopIteration, json.JSONDecodeError):
+                value, end = None, -1
+            match: Optional[re.Match[str]] = (
+                separator.match(buffer, end) if end >= 0 else None
+            )
+            if match is not None and match.end() < len(buffer):
+                self.pos = match.end()
+                yield value
+                if match.group(1) == "]":
+                    return
+                continue
+            yield self.decode()
+            if self.peek() == ",":
+                self.pos += 1
+                self.peek()
+                continue
+            self.expect("]")
+            return
+
+
+def iter_json_array(
+    data_file: Path, key: str = "RECORDS", chunk_size: int = 1 << 20
+) -> Generator[Any, Any, None]:
+    """
+    流式读取 JSON 文件顶层对象中 key 对应的数组，逐个返回其中的元素。
+    key 不存在时不返回任何元素。
+
+    Parameters:
+        data_file (Path): JSON 文件。
+        key (str, optional): 数组对应的键，默认为 "RECORDS"。
+        chunk_size (int, optional): 每次读取的字符数，默认为 1M。
+
+    Yields:
+        Any: 数组中的元素。
     """
-    # 读取JSON数据
     with open(file=data_file, mode="r", encoding="utf-8") as f:
-        data = json.load(f)
+        stream: _JsonStream = _JsonStream(f=f, chunk_size=chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            name: str = stream.decode()
+            stream.expect(":")
+            if name == key:
+                yield from stream.iter_array()
+                return
+            if stream.peek() == "[":
+                for _ in stream.iter_array():
+                    pass
+            else:
+                stream.decode()
+            if stream.peek() != ",":
+                return
+            stream.pos += 1
+
+
+def record_to_row(record: dict[str, Any]) -> tuple:
+    """
+    将 JSON 记录转换为与 COLUMNS 顺序一致的数据库行。
+    """
+    return (
+        record["original"],
+        record["processed"],
+        record["time_stamp"],
+        _ENCODER.encode(record["feature"]),
+        _ENCODER.encode(record["shooting_position"]),
+        record["wind_dir"],
+        record["wind_scale"],
+        record["wind_speed"],
+        record["humidity"],
+        record["precip"],
+        record["pressure"],
+        record["vis"],
+        record["cloud"],
+        record["AS"],
+        record["HS"],
+        record["weather"],
+        record["temperature"],
+    )
+
+
+def _batched(iterable: Iterable[Any], batch_size: int) -> Generator[list, Any, None]:
+    batch: list[Any] = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def convert_to_sqlite(
+    data_file: Path,
+    database_file: Path,
+    batch_size: int = 10000,
+    cache_size_kib: int = 262144,
+) -> int:
+    """
+    将JSON数据转换为SQLite数据库
+
+    记录以流的方式读取，按 batch_size 条一批在显式事务中写入，
+    导入期间关闭日志和同步，数据写入完成后再建立索引。
+
+    Parameters:
+        data_file (Path): JSON 文件。
+        database_file (Path): SQLite 数据库文件，已存在时会被删除。
+        batch_size (int, optional): 每个事务写入的记录数，默认为 10000。
+        cache_size_kib (int, optional): 导入期间的页缓存大小（KiB），默认为 256MiB。
+
+    Returns:
+        int: 写入的记录数。
+    """
+    start: float = time.perf_counter()
 
     # 删除旧的数据库文件
     database_file.unlink(missing_ok=True)
 
     # 创建SQLite数据库和表
-    conn: sqlite3.Connection = sqlite3.connect(database=database_file)
-    cursor: sqlite3.Cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS records (
-        id INTEGER PRIMARY KEY,
-        original TEXT,
-        processed TEXT,
-        time_stamp TEXT,
-        feature TEXT,
-        shooting_position TEXT,
-        wind_dir TEXT,
-        wind_scale INTEGER,
-        wind_speed INTEGER,
-        humidity INTEGER,
-        precip REAL,
-        pressure INTEGER,
-        vis INTEGER,
-        cloud INTEGER,
-        `AS` REAL,
-        `HS` REAL,
-        weather TEXT,
-        temperature REAL
+    conn: sqlite3.Connection = sqlite3.connect(
+        database=database_file, isolation_level=None
     )
-    """)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(f"PRAGMA cache_size=-{int(cache_size_kib)}")
+    conn.execute(CREATE_TABLE_SQL)
 
     # 插入数据
-    for record in data["RECORDS"]:
-        cursor.execute(
-            """
-        INSERT INTO records (
-            original, processed, time_stamp, feature, shooting_position, 
-            wind_dir, wind_scale, wind_speed, humidity, precip, pressure, 
-            vis, cloud, `AS`, `HS`, weather, temperature
+    count: int = 0
+    rows: Generator[tuple, Any, None] = (
+        record_to_row(record) for record in iter_json_array(data_file=data_file)
+    )
+    for batch in _batched(rows, batch_size):
+        conn.execute("BEGIN")
+        conn.executemany(INSERT_SQL, batch)
+        conn.execute("COMMIT")
+        count += len(batch)
+
+    # 建立索引
+    conn.execute("BEGIN")
+    for sql in CREATE_INDEX_SQL:
+        conn.execute(sql)
+    conn.execute("COMMIT")
+
+    # 恢复默认设置并关闭
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+
+    elapsed: float = time.perf_counter() - start
+    print(
+        f"导入{count}条记录，用时{elapsed:.2f}秒，"
+        f"{count / elapsed if elapsed else 0:.0f}条/秒。"
+    )
+    return count
+
+
+def ensure_unique_index(conn: sqlite3.Connection, column: str) -> None:
+    """
+    确保 records 表的 column 列上存在唯一索引。
+    """
+    for index in conn.execute("PRAGMA index_list(records)").fetchall():
+        if not index[2]:
+            continue
+        info: list[Any] = conn.execute(f"PRAGMA index_info(`{index[1]}`)").fetchall()
+        if [i[2] for i in info] == [column]:
+            return
+    conn.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS idx_records_{column}_unique "
+        f"ON records (`{column}`)"
+    )
+
+
+def drop_unique_index(conn: sqlite3.Connection, column: str) -> None:
+    """
+    将 records 表的 column 列上的唯一索引替换为普通索引。
+    合并时只有唯一键需要唯一索引，其他列（例如文件夹移动后 original 改变而 time_stamp 不变）
+    上的唯一索引会使插入失败。
+    """
+    for index in conn.execute("PRAGMA index_list(records)").fetchall():
+        if not index[2] or index[3] != "c":
+            continue
+        info: list[Any] = conn.execute(f"PRAGMA index_info(`{index[1]}`)").fetchall()
+        if [i[2] for i in info] == [column]:
+            conn.execute(f"DROP INDEX `{index[1]}`")
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_records_{column} ON records (`{column}`)"
+    )
+
+
+def _sql_literal(value: Any) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def merge_to_sqlite(
+    data_file: Path,
+    database_file: Path,
+    key: Literal["original", "time_stamp"] = "original",
+    update_columns: Optional[Iterable[str]] = None,
+    fill_columns: Iterable[str] = ("shooting_position",),
+    batch_size: int = 10000,
+) -> dict[str, int]:
+    """
+    将JSON数据合并到已有的SQLite数据库
+
+    以 key 列为唯一键执行 INSERT ... ON CONFLICT DO UPDATE：新记录直接插入；
+    已存在的记录只更新 update_columns 中的列，且仅在值发生变化时写入，
+    其余列（天气、地物类型等标注结果）保持数据库中的值不变。
+    JSON 中的 TOMBSTONES 对应的记录会被删除。
+
+    Parameters:
+        data_file (Path): JSON 文件。
+        database_file (Path): SQLite 数据库文件，不存在时会被创建。
+        key (str, optional): 唯一键，"original" 或 "time_stamp"，默认为 "original"。
+        update_columns (Iterable[str], optional): 冲突时更新的列，
+            默认为 original、processed、time_stamp 中除 key 以外的列。
+        fill_columns (Iterable[str], optional): 只在数据库中的值未设置（NULL 或 UNSET_VALUES）
+            时才更新的列，用于补充扫描得到的信息而不覆盖人工标注，默认为 shooting_position。
+        batch_size (int, optional): 每个事务写入的记录数，默认为 10000。
+
+    Returns:
+        dict (str, int): 新增、更新、未变化和删除的记录数。
+    """
+    if key not in ("original", "time_stamp"):
+        raise ValueError(f"不支持的唯一键：{key}")
+    columns: list[str] = list(
+        update_columns
+        if update_columns is not None
+        else [c for c in ("original", "processed", "time_stamp") if c != key]
+    )
+    for column in columns:
+        if column not in COLUMNS or column == key:
+            raise ValueError(f"无法更新的列：{column}")
+
+    fills: list[str] = [c for c in fill_columns if c not in columns]
+    for column in fills:
+        if column not in COLUMNS or column == key:
+            raise ValueError(f"无法更新的列：{column}")
+
+    def unset(column: str, table: str) -> str:
+        condition: str = f"{table}.`{column}` IS NULL"
+        if column in UNSET_VALUES:
+            condition += (
+                f" OR {table}.`{column}` = {_sql_literal(UNSET_VALUES[column])}"
+            )
+        return f"({condition})"
+
+    assignments: list[str] = [f"`{c}` = excluded.`{c}`" for c in columns] + [
+        f"`{c}` = CASE WHEN {unset(c, 'records')} "
+        f"THEN excluded.`{c}` ELSE records.`{c}` END"
+        for c in fills
+    ]
+    conditions: list[str] = [
+        f"records.`{c}` IS NOT excluded.`{c}`" for c in columns
+    ] + [f"({unset(c, 'records')} AND NOT {unset(c, 'excluded')})" for c in fills]
+    upsert_sql: str = INSERT_SQL + f"ON CONFLICT (`{key}`) DO NOTHING"
+    if assignments:
+        upsert_sql = (
+            INSERT_SQL
+            + f"ON CONFLICT (`{key}`) DO UPDATE SET "
+            + ", ".join(assignments)
+            + " WHERE "
+            + " OR ".join(conditions)
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-            (
-                record["original"],
-                record["processed"],
-                record["time_stamp"],
-                json.dumps(record["feature"], ensure_ascii=False),
-                json.dumps(record["shooting_position"], ensure_ascii=False),
-                record["wind_dir"],
-                record["wind_scale"],
-                record["wind_speed"],
-                record["humidity"],
-                record["precip"],
-                record["pressure"],
-                record["vis"],
-                record["cloud"],
-                record["AS"],
-                record["HS"],
-                record["weather"],
-                record["temperature"],
-            ),
+
+    start: float = time.perf_counter()
+    conn: sqlite3.Connection = sqlite3.connect(
+        database=database_file, isolation_level=None
+    )
+    try:
+        conn.execute(CREATE_TABLE_SQL)
+        try:
+            ensure_unique_index(conn=conn, column=key)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"数据库中存在重复的 {key}，无法合并") from e
+        drop_unique_index(
+            conn=conn, column="time_stamp" if key == "original" else "original"
         )
+        conn.execute(PROCESSED_INDEX_SQL)
 
-    # 提交并关闭
-    conn.commit()
-    conn.close()
+        # 使用 rowcount 而不是 total_changes 计数，后者包含触发器写入的行
+        before: int = conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        written: int = 0
+        total: int = 0
+        rows: Generator[tuple, Any, None] = (
+            record_to_row(record) for record in iter_json_array(data_file=data_file)
+        )
+        for batch in _batched(rows, batch_size):
+            conn.execute("BEGIN")
+            written += conn.executemany(upsert_sql, batch).rowcount
+            conn.execute("COMMIT")
+            total += len(batch)
+        inserted: int = (
+            conn.execute("SELECT COUNT(*) FROM records").fetchone()[0] - before
+        )
+
+        # 删除已不存在的文件对应的记录
+        deleted: int = 0
+        tombstones: Generator[tuple, Any, None] = (
+            (str(t["file"]), str(t["file"]))
+            for t in iter_json_array(data_file=data_file, key="TOMBSTONES")
+        )
+        for batch in _batched(tombstones, batch_size):
+            conn.execute("BEGIN")
+            deleted += conn.executemany(
+                "DELETE FROM records WHERE original = ? OR processed = ?", batch
+            ).rowcount
+            conn.execute("COMMIT")
+    finally:
+        conn.close()
 
+    result: dict[str, int] = {
+        "inserted": inserted,
+        "updated": written - inserted,
+        "unchanged": total - written,
+        "deleted": deleted,
+    }
+    elapsed: float = time.perf_counter() - start
+    print(
+        f"合并{total}条记录：新增{result['inserted']}条，更新{result['updated']}条，"
+        f"未变化{result['unchanged']}条，删除{result['deleted']}条，用时{elapsed:.2f}秒。"
+    )
+    return result
 
-def convert_to_json(database_file: Path, output_file: Path) -> None:
+
+def iter_records(
+    database_file: Path, batch_size: int = 1000
+) -> Generator[dict[str, Any], Any, None]:
     """
-    将SQLite数据库转换为JSON数据
+    按 fetchmany 批次逐条读取数据库中的记录，feature 和 shooting_position 会被解析为 JSON。
+
+    Parameters:
+        database_file (Path): SQLite 数据库文件。
+        batch_size (int, optional): 每次读取的记录数，默认为 1000。
+
+    Yields:
+        dict (str, Any): 包含 id 和 COLUMNS 中各列的记录。
     """
     conn: sqlite3.Connection = sqlite3.connect(database_file)
-    cursor: sqlite3.Cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM records")
-    records: list[Any] = cursor.fetchall()
+    try:
+        cursor: sqlite3.Cursor = conn.execute(
+            f"SELECT id, {SELECT_COLUMNS} FROM records ORDER BY id"
+        )
+        columns: list[str] = [column[0] for column in cursor.description]
+        while True:
+            rows: list[Any] = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                record_dict: dict[str, Any] = dict(zip(columns, row))
+                record_dict["feature"] = json.loads(record_dict["feature"])
+                record_dict["shooting_position"] = json.loads(
+                    record_dict["shooting_position"]
+                )
+                yield record_dict
+    finally:
+        conn.close()
 
-    columns: list[str | Any] = [column[0] for column in cursor.description]
 
-    data: dict[str, Any] = {"RECORDS": []}
-    for record in records:
-        record_dict = dict(zip(columns, record))
+def convert_to_json(
+    database_file: Path,
+    output_file: Path,
+    fmt: Literal["json", "compact", "jsonl"] = "json",
+    batch_size: int = 1000,
+) -> int:
+    """
+    将SQLite数据库转换为JSON数据
 
-        record_dict["feature"] = json.loads(record_dict["feature"])
-        record_dict["shooting_position"] = json.loads(record_dict["shooting_position"])
+    记录按批次读取并逐条写入文件，内存占用与数据量无关。
 
-        data["RECORDS"].append(record_dict)
+    Parameters:
+        database_file (Path): SQLite 数据库文件。
+        output_file (Path): 输出文件。
+        fmt (str, optional): 输出格式，默认为 "json"。
+            "json": {"RECORDS": [...]}，缩进为 4，与 json.dump(indent=4) 的输出完全一致；
+            "compact": {"RECORDS": [...]}，不缩进、不带多余空格；
+            "jsonl": 每行一条记录（JSON Lines）。
+        batch_size (int, optional): 每次读取的记录数，默认为 1000。
 
+    Returns:
+        int: 写入的记录数。
+    """
+    count: int = 0
+    records: Generator[dict[str, Any], Any, None] = iter_records(
+        database_file=database_file, batch_size=batch_size
+    )
     with open(file=output_file, mode="w", encoding="utf-8") as f:
-        json.dump(obj=data, fp=f, ensure_ascii=False, indent=4)
+        if fmt == "jsonl":
+            encoder: json.JSONEncoder = json.JSONEncoder(
+                ensure_ascii=False, separators=(",", ":")
+            )
+            for record in records:
+                f.write(encoder.encode(record))
+                f.write("\n")
+                count += 1
+            return count
 
-    conn.close()
+        if fmt == "compact":
+            encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+            f.write('{"RECORDS":[')
+            for record in records:
+                if count:
+                    f.write(",")
+                f.write(encoder.encode(record))
+                count += 1
+            f.write("]}")
+            return count
+
+        # 逐条编码后整体缩进两级，结果与对整个字典调用 json.dump(indent=4) 相同
+        encoder = json.JSONEncoder(ensure_ascii=False, indent=4)
+        prefix: str = "\n" + " " * 8
+        f.write('{\n    "RECORDS": [')
+        for record in records:
+            if count:
+                f.write(",")
+            f.write(prefix)
+            f.write(encoder.encode(record).replace("\n", prefix))
+            count += 1
+        f.write("\n    ]\n}" if count else "]\n}")
+    return count
+
+
+ARROW_TYPES: dict[str, str] = {
+    "id": "int64",
+    "original": "string",
+    "processed": "string",
+    "time_stamp": "timestamp[s]",
+    "feature": "list<string>",
+    "feature_mask": "int16",
+    "longitude": "float64",
+    "latitude": "float64",
+    "wind_dir": "string",
+    "wind_scale": "int32",
+    "wind_speed": "int32",
+    "humidity": "int32",
+    "precip": "float64",
+    "pressure": "int32",
+    "vis": "int32",
+    "cloud": "int32",
+    "AS": "float64",
+    "HS": "float64",
+    "weather": "string",
+    "temperature": "float64",
+}
+"convert_to_arrow 输出的列及其类型"
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("导出 Parquet/Arrow 需要安装 pyarrow：pip install pyarrow")
+
+
+def arrow_schema() -> "pa.Schema":
+    """
+    返回 convert_to_arrow 输出的 Arrow schema，列顺序与 ARROW_TYPES 一致。
+    """
+    _require_pyarrow()
+    types: dict[str, pa.DataType] = {
+        "int16": pa.int16(),
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+        "timestamp[s]": pa.timestamp("s"),
+        "list<string>": pa.list_(pa.string()),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in ARROW_TYPES.items()])
+
+
+def _to_array(values: list[Any], kind: "pa.DataType") -> "pa.Array":
+    try:
+        return pa.array(values, type=kind)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        # 旧数据中可能存在空字符串或以字符串保存的数字
+        convert: Callable[[Any], Any] = int if pa.types.is_integer(kind) else float
+        cleaned: list[Any] = []
+        for value in values:
+            try:
+                cleaned.append(None if value in (None, "") else convert(value))
+            except (TypeError, ValueError):
+                cleaned.append(None)
+        return pa.array(cleaned, type=kind)
+
+
+def _rows_to_batch(
+    rows: list[tuple], schema: "pa.Schema", feature_types: tuple[str, ...]
+) -> "pa.RecordBatch":
+    columns: list[list[Any]] = [list(column) for column in zip(*rows)]
+    data: dict[str, list[Any]] = dict(zip(("id", *COLUMNS), columns))
+
+    features: list[Optional[list[str]]] = [
+        json.loads(value) if value else None for value in data["feature"]
+    ]
+    data["feature"] = features
+    data["feature_mask"] = [
+        (
+            None
+            if feature is None
+            else sum(1 << feature_types.index(f) for f in feature if f in feature_types)
+        )
+        for feature in features
+    ]
+    positions: list[Any] = [
+        json.loads(value) if value else None for value in data["shooting_position"]
+    ]
+    data["longitude"] = [p[0] if p else None for p in positions]
+    data["latitude"] = [p[1] if p else None for p in positions]
+
+    arrays: list[pa.Array] = []
+    for field in schema:
+        if field.name == "time_stamp":
+            arrays.append(
+                pc.strptime(
+                    pa.array(data["time_stamp"], type=pa.string()),
+                    format="%Y-%m-%d %H:%M:%S",
+                    unit="s",
+                    error_is_null=True,
+                )
+            )
+        else:
+            arrays.append(_to_array(data[field.name], field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def convert_to_arrow(
+    database_file: Path,
+    output_file: Path,
+    fmt: Literal["parquet", "arrow"] = "parquet",
+    batch_size: int = 65536,
+    compression: Optional[str] = "zstd",
+) -> int:
+    """
+    将SQLite数据库导出为 Parquet 或 Arrow IPC 文件，需要安装 pyarrow。
+
+    记录按 batch_size 条一批从游标读取，每批写为一个 row group / record batch，
+    内存占用与数据量无关。各列为类型化的列（见 ARROW_TYPES）：
+    feature 为字符串列表并附带 feature_mask 位掩码，shooting_position 拆分为 longitude 和 latitude。
+
+    Parameters:
+        database_file (Path): SQLite 数据库文件。
+        output_file (Path): 输出文件。
+        fmt (str, optional): 输出格式，默认为 "parquet"。
+            "parquet": Parquet 文件，按 compression 压缩；
+            "arrow": 不压缩的 Arrow IPC 文件，可以用 read_arrow 以内存映射方式零拷贝读取。
+        batch_size (int, optional): 每批的记录数，默认为 65536。
+        compression (str, optional): Parquet 的压缩算法，默认为 "zstd"。
+
+    Returns:
+        int: 写入的记录数。
+    """
+    _require_pyarrow()
+    from get_file import PicData  # pylint: disable=import-outside-toplevel
+
+    if fmt not in ("parquet", "arrow"):
+        raise ValueError(f"不支持的格式：{fmt}")
+    schema: pa.Schema = arrow_schema()
+    feature_types: tuple[str, ...] = tuple(PicData.FEATURE_TYPE)
+    count: int = 0
+    start: float = time.perf_counter()
+    conn: sqlite3.Connection = sqlite3.connect(database_file)
+    try:
+        cursor: sqlite3.Cursor = conn.execute(
+            f"SELECT id, {SELECT_COLUMNS} FROM records ORDER BY id"
+        )
+        writer: Any = (
+            pq.ParquetWriter(str(output_file), schema, compression=compression)
+            if fmt == "parquet"
+            else pa.ipc.new_file(str(output_file), schema)
+        )
+        try:
+            while rows := cursor.fetchmany(batch_size):
+                writer.write_batch(_rows_to_batch(rows, schema, feature_types))
+                count += len(rows)
+        finally:
+            writer.close()
+    finally:
+        conn.close()
+    elapsed: float = time.perf_counter() - start
+    print(
+        f"导出{count}条记录，用时{elapsed:.2f}秒，"
+        f"{count / elapsed if elapsed else 0:.0f}条/秒。"
+    )
+    return count
+
+
+def read_arrow(data_file: Path) -> "pa.Table":
+    """
+    读取 convert_to_arrow 导出的文件，需要安装 pyarrow。
+    Arrow IPC 文件以内存映射方式打开，返回的表直接引用映射的内存，不复制数据；
+    Parquet 文件需要解压，只以内存映射方式读取原始数据。
+
+    Parameters:
+        data_file (Path): Parquet 或 Arrow IPC 文件，按文件头识别格式。
+
+    Returns:
+        pyarrow.Table: 读取的表。
+    """
+    _require_pyarrow()
+    with open(file=data_file, mode="rb") as f:
+        magic: bytes = f.read(6)
+    if magic == b"ARROW1":
+        source: pa.MemoryMappedFile = pa.memory_map(str(data_file), "r")
+        return pa.ipc.open_file(source).read_all()
+    # Parquet 不支持以秒为单位的时间戳，写入时被转换为毫秒，读取时按 schema 还原
+    return pq.read_table(str(data_file), memory_map=True, schema=arrow_schema())
 
 
 if __name__ == "__main__":
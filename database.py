@@ -0,0 +1,1159 @@
+"""
+database.py
+"""
+
+import json
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from cache import LRUCache
+from convert import SELECT_COLUMNS, ensure_unique_index
+from get_file import Pair, PicData
+from stats import create_stats, progress_stats
+
+FEATURE_MASK_SQL: str = (
+    "CASE WHEN feature IS NULL OR feature = 'null' THEN NULL ELSE "
+    + " | ".join(
+        f"((instr(feature, '\"{name}\"') > 0) << {i})"
+        for i, name in enumerate(PicData.FEATURE_TYPE)
+    )
+    + " END"
+)
+"由 feature 列的 JSON 计算地物类型掩码，与 PicData.feature_mask 一致，未设置时为 NULL"
+
+STATUS_UNANNOTATED: int = 0
+"标注状态：未标注"
+
+STATUS_ANNOTATED: int = 1
+"标注状态：已在 GUI 中提交过标注"
+
+EXTRA_COLUMNS: tuple[tuple[str, str], ...] = (
+    ("feature_mask", f"INTEGER GENERATED ALWAYS AS ({FEATURE_MASK_SQL}) VIRTUAL"),
+    (
+        "longitude",
+        "REAL GENERATED ALWAYS AS (CASE WHEN json_valid(shooting_position) "
+        "THEN json_extract(shooting_position, '$[0]') END) VIRTUAL",
+    ),
+    (
+        "latitude",
+        "REAL GENERATED ALWAYS AS (CASE WHEN json_valid(shooting_position) "
+        "THEN json_extract(shooting_position, '$[1]') END) VIRTUAL",
+    ),
+    ("status", f"INTEGER NOT NULL DEFAULT {STATUS_UNANNOTATED}"),
+    ("annotated_at", "TEXT"),
+    ("version", "INTEGER NOT NULL DEFAULT 0"),
+)
+"convert.CREATE_TABLE_SQL 之外的列，打开数据库时自动补充"
+
+STATUS_BACKFILL_SQL: str = (
+    f"UPDATE records SET status = {STATUS_ANNOTATED} WHERE feature_mask IS NOT NULL"
+)
+"新增 status 列时，将已设置地物类型的记录视为已标注"
+
+EXTRA_INDEX_SQL: tuple[str, ...] = (
+    "CREATE INDEX IF NOT EXISTS idx_records_feature_mask ON records (feature_mask)",
+    "CREATE INDEX IF NOT EXISTS idx_records_weather ON records (weather)",
+    "CREATE INDEX IF NOT EXISTS idx_records_temperature ON records (temperature)",
+    "CREATE INDEX IF NOT EXISTS idx_records_humidity ON records (humidity)",
+    "CREATE INDEX IF NOT EXISTS idx_records_status ON records (status)",
+    "CREATE INDEX IF NOT EXISTS idx_records_annotated_at ON records (annotated_at)",
+)
+"筛选使用的二级索引"
+
+WORK_QUEUE_SQL: str = """
+CREATE TABLE IF NOT EXISTS work_queue (
+    start_id INTEGER PRIMARY KEY,
+    end_id INTEGER NOT NULL,
+    annotator TEXT,
+    claimed_at REAL
+)
+"""
+"多人标注时分配给各标注员的 id 范围 [start_id, end_id]，各范围互不重叠"
+
+CONNECTION_PRAGMAS: tuple[str, ...] = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16384",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA journal_size_limit=67108864",
+)
+"""
+每个连接的设置：WAL 模式下读取不阻塞写入，写入只在提交时刷新 WAL；
+每个连接 16 MiB 页缓存，并通过 256 MiB 的 mmap 在各线程间共享操作系统的页缓存；
+检查点后 WAL 文件截断到 64 MiB 以内
+"""
+
+POSITION_TABLE_SQL: str = """
+CREATE VIRTUAL TABLE IF NOT EXISTS records_position USING rtree(
+    id, min_longitude, max_longitude, min_latitude, max_latitude
+)
+"""
+"拍摄位置的 R*Tree 索引，只包含已设置拍摄位置（不为 (0, 0)）的记录"
+
+POSITION_FILL_SQL: str = """
+INSERT OR REPLACE INTO records_position
+SELECT id, longitude, longitude, latitude, latitude FROM records
+WHERE longitude IS NOT NULL AND latitude IS NOT NULL
+    AND (longitude != 0 OR latitude != 0)
+"""
+"根据 records 表重建 R*Tree 索引"
+
+POSITION_TRIGGER_SQL: tuple[str, ...] = (
+    """
+    CREATE TRIGGER IF NOT EXISTS records_position_insert AFTER INSERT ON records
+    WHEN NEW.longitude IS NOT NULL AND NEW.latitude IS NOT NULL
+        AND (NEW.longitude != 0 OR NEW.latitude != 0)
+    BEGIN
+        INSERT OR REPLACE INTO records_position VALUES (
+            NEW.id, NEW.longitude, NEW.longitude, NEW.latitude, NEW.latitude
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS records_position_update
+    AFTER UPDATE OF shooting_position ON records
+    WHEN OLD.shooting_position IS NOT NEW.shooting_position
+    BEGIN
+        DELETE FROM records_position WHERE id = OLD.id;
+        INSERT INTO records_position SELECT
+            NEW.id, NEW.longitude, NEW.longitude, NEW.latitude, NEW.latitude
+        WHERE NEW.longitude IS NOT NULL AND NEW.latitude IS NOT NULL
+            AND (NEW.longitude != 0 OR NEW.latitude != 0);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS records_position_delete AFTER DELETE ON records
+    BEGIN
+        DELETE FROM records_position WHERE id = OLD.id;
+    END
+    """,
+)
+"保持 R*Tree 索引与 records 表同步的触发器，所有写入路径都会经过这里"
+
+EARTH_RADIUS: float = 6371008.8
+"地球平均半径（米）"
+
+
+def haversine(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    """
+    计算两点之间的大圆距离。
+
+    Parameters:
+        lon1 (float): 第一个点的经度。
+        lat1 (float): 第一个点的纬度。
+        lon2 (float): 第二个点的经度。
+        lat2 (float): 第二个点的纬度。
+
+    Returns:
+        float: 距离（米）。
+    """
+    phi1: float = math.radians(lat1)
+    phi2: float = math.radians(lat2)
+    a: float = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+UPDATE_SQL: str = f"""
+UPDATE records SET
+    original=?,
+    processed=?,
+    time_stamp=?,
+    feature=?,
+    shooting_position=?,
+    wind_dir=?,
+    wind_scale=?,
+    wind_speed=?,
+    humidity=?,
+    precip=?,
+    pressure=?,
+    vis=?,
+    cloud=?,
+    `AS`=?,
+    `HS`=?,
+    weather=?,
+    temperature=?,
+    status={STATUS_ANNOTATED},
+    annotated_at=datetime('now', 'localtime'),
+    version=version + 1
+WHERE id=?
+"""
+"按主键写回整个 Pair，同时将记录标记为已标注"
+
+VERSIONED_UPDATE_SQL: str = UPDATE_SQL.rstrip() + " AND version=?"
+"只在行版本与读取时一致时写回 Pair 的 UPDATE_SQL，用于多人标注时的乐观并发控制"
+
+
+BATCH_FIELDS: tuple[str, ...] = (
+    "weather",
+    "feature",
+    "shooting_position",
+    "temperature",
+    "humidity",
+    "precip",
+    "pressure",
+    "vis",
+    "cloud",
+    "wind_dir",
+    "wind_scale",
+    "wind_speed",
+)
+"可以批量修改的字段"
+
+
+def fields_to_columns(fields: dict[str, Any]) -> dict[str, Any]:
+    """
+    经 PicData 的校验和转换后，将字段值转换为数据库中的列值，未知的地物类型会抛出 ValueError。
+
+    Parameters:
+        fields (dict[str, Any]): 字段名到值的映射，字段名必须在 BATCH_FIELDS 中。
+
+    Returns:
+        dict[str, Any]: 列名到列值的映射。
+    """
+    data: PicData = PicData()
+    for name, value in fields.items():
+        if name not in BATCH_FIELDS:
+            raise ValueError(f"无法批量修改的字段：{name}")
+        if name == "feature" and value is not None:
+            PicData.feature_to_mask(value)
+        setattr(data, name, value)
+    columns: dict[str, Any] = {}
+    for name in fields:
+        value = getattr(data, name)
+        if name in ("feature", "shooting_position"):
+            value = json.dumps(value, ensure_ascii=False)
+        columns[name] = value
+    return columns
+
+
+def pair_to_row(pair: Pair) -> tuple:
+    """
+    将 Pair 转换为 UPDATE_SQL 的参数。
+    """
+    return (
+        str(pair.original),
+        str(pair.processed),
+        pair.data.time_stamp,
+        json.dumps(pair.data.feature, ensure_ascii=False),
+        json.dumps(pair.data.shooting_position, ensure_ascii=False),
+        pair.data.wind_dir,
+        pair.data.wind_scale,
+        pair.data.wind_speed,
+        pair.data.humidity,
+        pair.data.precip,
+        pair.data.pressure,
+        pair.data.vis,
+        pair.data.cloud,
+        pair.data.AS,
+        pair.data.HS,
+        pair.data.weather,
+        pair.data.temperature,
+        pair.id,
+    )
+
+
+class Database:
+    """
+    数据库访问层。
+    Gradio 的回调在线程池中执行，因此每个线程持有一个长期连接，不再每次提交都重新连接。
+    sqlite3 会在连接上缓存已编译的语句，重复执行同一条 SQL 时不需要重新解析。
+    读取可以在各线程中并发进行；写入通过 transaction 串行化，同一时间只有一个线程持有写事务，
+    避免多个线程在 SQLite 的忙等待中相互竞争。
+    """
+
+    def __init__(self, database_file: Path, timeout: float = 30.0) -> None:
+        self.database_file: Path = database_file
+        "数据库文件"
+
+        self.timeout: float = timeout
+        "等待写锁的超时时间（秒）"
+
+        self._local: threading.local = threading.local()
+        self._lock: threading.Lock = threading.Lock()
+        self._write_lock: threading.Lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+        self._migrated: bool = False
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        返回当前线程的连接，不存在时创建。
+        """
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        try:
+            conn = sqlite3.connect(
+                database=self.database_file,
+                timeout=self.timeout,
+                check_same_thread=False,
+            )
+        except sqlite3.Error as e:
+            raise LookupError("未能接入到 SQL") from e
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        self._local.conn = conn
+        with self._lock:
+            self._connections.append(conn)
+        if not self._migrated:
+            self.migrate()
+        return conn
+
+    def migrate(self) -> None:
+        """
+        为旧版本生成的数据库补充 EXTRA_COLUMNS 中的列和索引，以及 R*Tree 索引和统计用的聚合表。
+        """
+        conn: sqlite3.Connection = self.connection()
+        with self._lock:
+            if self._migrated:
+                return
+            try:
+                with conn:
+                    ensure_unique_index(conn=conn, column="original")
+                    columns: set[str] = {
+                        row[1] for row in conn.execute("PRAGMA table_xinfo(records)")
+                    }
+                    for name, definition in EXTRA_COLUMNS:
+                        if name not in columns:
+                            conn.execute(
+                                f"ALTER TABLE records ADD COLUMN {name} {definition}"
+                            )
+                    if "status" not in columns:
+                        conn.execute(STATUS_BACKFILL_SQL)
+                    for sql in EXTRA_INDEX_SQL:
+                        conn.execute(sql)
+                    if not conn.execute(
+                        "SELECT 1 FROM sqlite_master WHERE name = 'records_position'"
+                    ).fetchone():
+                        conn.execute(POSITION_TABLE_SQL)
+                        conn.execute(POSITION_FILL_SQL)
+                    for sql in POSITION_TRIGGER_SQL:
+                        conn.execute(sql)
+                    create_stats(conn)
+                    conn.execute(WORK_QUEUE_SQL)
+            except sqlite3.IntegrityError as e:
+                raise ValueError("数据库中存在重复的 original") from e
+            self._migrated = True
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        在进程内的写锁中开启 IMMEDIATE 事务，正常退出时提交，出错时回滚。
+
+        Yields:
+            sqlite3.Connection: 当前线程的连接。
+        """
+        conn: sqlite3.Connection = self.connection()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self) -> None:
+        """
+        关闭所有线程的连接。
+        """
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def load_all(self) -> List[Tuple]:
+        """
+        读取全部记录，各行的列顺序与 Pair.load_from_tuple 一致。
+        """
+        cursor: sqlite3.Cursor = self.connection().execute(
+            f"SELECT id, {SELECT_COLUMNS} FROM records ORDER BY id"
+        )
+        return cursor.fetchall()
+
+    def query(
+        self, record_filter: "RecordFilter", limit: Optional[int] = 1000
+    ) -> List[Tuple]:
+        """
+        按 id 顺序返回满足条件的记录的 id 和 original。
+
+        Parameters:
+            record_filter (RecordFilter): 筛选条件。
+            limit (int, optional): 最多返回的记录数，默认为 1000，None 表示不限制。
+        """
+        where, params = record_filter.to_sql()
+        sql: str = f"SELECT id, original FROM records WHERE {where} ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.connection().execute(sql, params).fetchall()
+
+    def count(self, record_filter: Optional["RecordFilter"] = None) -> int:
+        """
+        返回满足条件的记录数。
+        """
+        where, params = (
+            record_filter.to_sql() if record_filter is not None else ("1", [])
+        )
+        return (
+            self.connection()
+            .execute(f"SELECT COUNT(*) FROM records WHERE {where}", params)
+            .fetchone()[0]
+        )
+
+    def within_bbox(
+        self,
+        min_longitude: float,
+        min_latitude: float,
+        max_longitude: float,
+        max_latitude: float,
+        limit: Optional[int] = None,
+    ) -> List[Tuple]:
+        """
+        通过 R*Tree 索引查找拍摄位置在矩形范围内的记录。
+
+        Parameters:
+            min_longitude (float): 最小经度。
+            min_latitude (float): 最小纬度。
+            max_longitude (float): 最大经度。
+            max_latitude (float): 最大纬度。
+            limit (int, optional): 最多返回的记录数，默认不限制。
+
+        Returns:
+            List[Tuple]: 按 id 排序的 (id, original, 经度, 纬度)。
+        """
+        # R*Tree 以单精度保存坐标，结果需要再用 records 表中的精确坐标过滤
+        sql: str = """
+            SELECT r.id, r.original, r.longitude, r.latitude
+            FROM records_position AS p JOIN records AS r ON r.id = p.id
+            WHERE p.max_longitude >= ? AND p.min_longitude <= ?
+                AND p.max_latitude >= ? AND p.min_latitude <= ?
+                AND r.longitude BETWEEN ? AND ? AND r.latitude BETWEEN ? AND ?
+            ORDER BY r.id
+        """
+        params: list[Any] = [
+            min_longitude,
+            max_longitude,
+            min_latitude,
+            max_latitude,
+            min_longitude,
+            max_longitude,
+            min_latitude,
+            max_latitude,
+        ]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.connection().execute(sql, params).fetchall()
+
+    def within_radius(
+        self, longitude: float, latitude: float, radius: float
+    ) -> List[Tuple]:
+        """
+        查找拍摄位置距 (longitude, latitude) 不超过 radius 米的记录。
+        先用外接矩形在 R*Tree 中查找候选记录，再计算精确距离。
+
+        Parameters:
+            longitude (float): 中心经度。
+            latitude (float): 中心纬度。
+            radius (float): 半径（米）。
+
+        Returns:
+            List[Tuple]: 按距离排序的 (id, original, 经度, 纬度, 距离)。
+        """
+        dlat: float = math.degrees(radius / EARTH_RADIUS)
+        cos_lat: float = math.cos(math.radians(min(abs(latitude) + dlat, 90.0)))
+        dlon: float = 180.0 if cos_lat < 1e-9 else min(dlat / cos_lat, 180.0)
+        results: List[Tuple] = []
+        for row in self.within_bbox(
+            longitude - dlon, latitude - dlat, longitude + dlon, latitude + dlat
+        ):
+            distance: float = haversine(longitude, latitude, row[2], row[3])
+            if distance <= radius:
+                results.append((*row, distance))
+        results.sort(key=lambda row: row[4])
+        return results
+
+    def position_clusters(self, precision: int = 3) -> List[Tuple]:
+        """
+        将拍摄位置按经纬度四舍五入到 precision 位小数后分组，
+        precision 为 3 时约为 100 米的网格。只扫描 R*Tree 索引，不解析 JSON。
+
+        Returns:
+            List[Tuple]: 按记录数降序排列的 (经度, 纬度, 记录数)。
+        """
+        return (
+            self.connection()
+            .execute(
+                "SELECT round(min_longitude, ?) AS lon, round(min_latitude, ?) AS lat, "
+                "COUNT(*) AS n FROM records_position GROUP BY lon, lat "
+                "ORDER BY n DESC",
+                (precision, precision),
+            )
+            .fetchall()
+        )
+
+    def distinct(self, column: str) -> List[Any]:
+        """
+        返回 column 列中出现过的全部非空值，用于生成筛选选项。
+        """
+        return [
+            row[0]
+            for row in self.connection().execute(
+                f"SELECT DISTINCT `{column}` FROM records "
+                f"WHERE `{column}` IS NOT NULL ORDER BY `{column}`"
+            )
+        ]
+
+    def index_of(self, pair_id: int) -> int:
+        """
+        返回 id 对应的记录在按 id 排序的表中的下标，即 PairRepository 中的下标。
+        需要对 id 之前的记录计数，GUI 中应使用 PairRepository.index_of。
+        """
+        return (
+            self.connection()
+            .execute("SELECT COUNT(*) FROM records WHERE id < ?", (pair_id,))
+            .fetchone()[0]
+        )
+
+    def annotation_status(self, pair_id: int) -> Tuple[int, Optional[str]]:
+        """
+        返回记录的标注状态和最后一次标注的时间，未标注时时间为 None。
+        """
+        row: Optional[Tuple] = (
+            self.connection()
+            .execute(
+                "SELECT status, annotated_at FROM records WHERE id = ?", (pair_id,)
+            )
+            .fetchone()
+        )
+        if row is None:
+            raise LookupError(f"不存在 id 为 {pair_id} 的记录")
+        return row
+
+    def next_unannotated(
+        self, pair_id: int, id_range: Optional[Tuple[int, int]] = None
+    ) -> Optional[int]:
+        """
+        返回 id 大于 pair_id 的第一条未标注记录的 id，之后没有时从头查找。
+        每次查找都是 status 索引上的一次范围查询。
+
+        Parameters:
+            pair_id (int): 当前记录的 id。
+            id_range (tuple[int, int], optional): 只在 id 闭区间 [起始 id, 结束 id] 内查找，
+                用于多人标注时分配到的范围，默认为整个表。pair_id 在范围之前时从范围起点查找。
+
+        Returns:
+            int: 记录的 id，全部记录都已标注时返回 None。
+        """
+        first, last = id_range if id_range is not None else (0, (1 << 63) - 1)
+        conn: sqlite3.Connection = self.connection()
+        for after in (max(pair_id, first - 1), first - 1):
+            row: Optional[Tuple] = conn.execute(
+                "SELECT id FROM records WHERE status = ? AND id > ? AND id <= ? "
+                "ORDER BY id LIMIT 1",
+                (STATUS_UNANNOTATED, after, last),
+            ).fetchone()
+            if row is not None:
+                return row[0]
+        return None
+
+    def load_pair(self, pair_id: int) -> Tuple[Pair, int]:
+        """
+        从数据库读取最新的 Pair 及其行版本，用于多人标注时绕过 PairRepository 的缓存。
+        """
+        row: Optional[Tuple] = (
+            self.connection()
+            .execute(
+                f"SELECT id, {SELECT_COLUMNS}, version FROM records WHERE id = ?",
+                (pair_id,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            raise LookupError(f"不存在 id 为 {pair_id} 的记录")
+        pair: Pair = Pair()
+        pair.load_from_tuple(row[:-1])
+        return (pair, row[-1])
+
+    def update_pair_versioned(self, pair: Pair, version: int) -> Optional[int]:
+        """
+        只在记录的行版本仍为 version 时写回 Pair，即读取之后没有被其他人修改过。
+
+        Parameters:
+            pair (Pair): 要写回的 Pair。
+            version (int): 读取 Pair 时的行版本。
+
+        Returns:
+            int: 写入后的行版本，记录已被修改（版本不一致）时返回 None，不写入。
+        """
+        if pair.id is None:
+            raise ValueError(f"{pair.original} 没有对应的数据库记录")
+        with self.transaction() as conn:
+            cursor: sqlite3.Cursor = conn.execute(
+                VERSIONED_UPDATE_SQL, (*pair_to_row(pair), version)
+            )
+        return version + 1 if cursor.rowcount == 1 else None
+
+    def claim_range(
+        self, annotator: str, size: int = 200, lease: float = 3600.0
+    ) -> Optional[Tuple[int, int]]:
+        """
+        为标注员分配一段 id 范围，范围之间互不重叠，多个标注员不会标注同一张图像。
+        依次尝试：该标注员已领取且仍有未标注记录的范围；超过 lease 秒未续租（见 renew_claim）
+        且仍未完成的范围；
+        从已分配范围之后的第一条未标注记录开始，包含 size 条未标注记录的新范围。
+
+        Parameters:
+            annotator (str): 标注员名称。
+            size (int, optional): 新范围包含的未标注记录数，默认为 200。
+            lease (float, optional): 范围的租期（秒），超时后可以分配给其他标注员，默认为 1 小时。
+
+        Returns:
+            tuple[int, int]: 范围的 (起始 id, 结束 id)，闭区间；没有可以分配的记录时返回 None。
+        """
+        now: float = time.time()
+        pending: str = (
+            f"EXISTS (SELECT 1 FROM records WHERE status = {STATUS_UNANNOTATED} "
+            "AND id BETWEEN start_id AND end_id)"
+        )
+        with self.transaction() as conn:
+            row: Optional[Tuple] = conn.execute(
+                "SELECT start_id, end_id FROM work_queue "
+                f"WHERE annotator = ? AND {pending} ORDER BY start_id LIMIT 1",
+                (annotator,),
+            ).fetchone()
+            if row is None:
+                row = conn.execute(
+                    "SELECT start_id, end_id FROM work_queue "
+                    f"WHERE claimed_at < ? AND {pending} ORDER BY start_id LIMIT 1",
+                    (now - lease,),
+                ).fetchone()
+            if row is None:
+                start: Optional[Tuple] = conn.execute(
+                    "SELECT id FROM records WHERE status = ? AND id > "
+                    "(SELECT coalesce(MAX(end_id), -1) FROM work_queue) "
+                    "ORDER BY id LIMIT 1",
+                    (STATUS_UNANNOTATED,),
+                ).fetchone()
+                if start is None:
+                    return None
+                end: Optional[Tuple] = conn.execute(
+                    "SELECT id FROM records WHERE status = ? AND id >= ? "
+                    "ORDER BY id LIMIT 1 OFFSET ?",
+                    (STATUS_UNANNOTATED, start[0], size - 1),
+                ).fetchone()
+                if end is None:
+                    end = conn.execute("SELECT MAX(id) FROM records").fetchone()
+                row = (start[0], end[0])
+            conn.execute(
+                "INSERT INTO work_queue (start_id, end_id, annotator, claimed_at) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT DO UPDATE SET "
+                "annotator = excluded.annotator, claimed_at = excluded.claimed_at",
+                (*row, annotator, now),
+            )
+        return row
+
+    def renew_claim(self, annotator: str, id_range: Tuple[int, int]) -> bool:
+        """
+        续租标注员领取的范围，将领取时间更新为当前时间，正在标注的范围不会因超时被重新分配。
+
+        Parameters:
+            annotator (str): 标注员名称。
+            id_range (tuple[int, int]): claim_range 返回的范围。
+
+        Returns:
+            bool: 范围仍属于该标注员时返回 True，已被重新分配给其他标注员时返回 False。
+        """
+        with self.transaction() as conn:
+            cursor: sqlite3.Cursor = conn.execute(
+                "UPDATE work_queue SET claimed_at = ? "
+                "WHERE start_id = ? AND end_id = ? AND annotator = ?",
+                (time.time(), *id_range, annotator),
+            )
+        return cursor.rowcount == 1
+
+    def remaining(self, id_range: Tuple[int, int]) -> int:
+        """
+        返回 id 闭区间 id_range 内未标注的记录数。
+        """
+        return (
+            self.connection()
+            .execute(
+                "SELECT COUNT(*) FROM records WHERE status = ? AND id BETWEEN ? AND ?",
+                (STATUS_UNANNOTATED, *id_range),
+            )
+            .fetchone()[0]
+        )
+
+    def progress(self) -> Tuple[int, int]:
+        """
+        返回 (已标注的记录数, 总记录数)，只读取 stats_progress 聚合表。
+        """
+        counts: dict[int, int] = progress_stats(self.connection())
+        return (counts.get(STATUS_ANNOTATED, 0), sum(counts.values()))
+
+    def iter_paths(self, batch_size: int = 1000) -> Iterator[Path]:
+        """
+        按 id 顺序逐个返回全部记录的原始图像和红外图像路径。
+        """
+        cursor: sqlite3.Cursor = self.connection().execute(
+            "SELECT original, processed FROM records ORDER BY id"
+        )
+        while True:
+            rows: list[Tuple] = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for original, processed in rows:
+                yield Path(original)
+                yield Path(processed)
+
+    def update_pair(self, pair: Pair) -> None:
+        """
+        按主键 id 写回一个 Pair。
+        """
+        self.update_pairs([pair])
+
+    def update_pairs(self, pairs: List[Pair]) -> None:
+        """
+        在一个事务中按主键 id 写回多个 Pair。
+        """
+        rows: list[tuple[Any, ...]] = []
+        for pair in pairs:
+            if pair.id is None:
+                raise ValueError(f"{pair.original} 没有对应的数据库记录")
+            rows.append(pair_to_row(pair))
+        with self.transaction() as conn:
+            conn.executemany(UPDATE_SQL, rows)
+
+    def ids(
+        self,
+        record_filter: Optional["RecordFilter"] = None,
+        start: int = 0,
+        stop: Optional[int] = None,
+    ) -> List[int]:
+        """
+        按 id 顺序返回满足条件的记录中下标在 [start, stop) 内的 id。
+        不带条件时下标与 PairRepository 一致。
+        """
+        where, params = (
+            record_filter.to_sql() if record_filter is not None else ("1", [])
+        )
+        params += [-1 if stop is None else max(stop - start, 0), start]
+        return [
+            row[0]
+            for row in self.connection().execute(
+                f"SELECT id FROM records WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+                params,
+            )
+        ]
+
+    def update_fields(
+        self,
+        ids: Iterable[int],
+        fields: dict[str, Any],
+        batch_size: int = 1000,
+        annotated: bool = True,
+    ) -> Iterator[int]:
+        """
+        在一个事务中将 fields 写入 ids 对应的全部记录，只修改 fields 中的列。
+        每写入 batch_size 条返回一次已写入的记录数，全部写入后提交；
+        中途停止迭代或出错时回滚。
+
+        Parameters:
+            ids (Iterable[int]): 记录的 id。
+            fields (dict[str, Any]): 字段名到值的映射，见 fields_to_columns。
+            batch_size (int, optional): 每次 executemany 的记录数，默认为 1000。
+            annotated (bool, optional): 是否同时将记录标记为已标注并记录时间，默认为 True。
+                为 False 时不修改标注状态。
+
+        Yields:
+            int: 已写入的记录数。
+        """
+        columns: dict[str, Any] = fields_to_columns(fields)
+        if not columns:
+            return
+        sql: str = (
+            "UPDATE records SET "
+            + ", ".join(f"`{name}` = ?" for name in columns)
+            + ", version = version + 1"
+            + (
+                f", status = {STATUS_ANNOTATED}, "
+                "annotated_at = datetime('now', 'localtime')"
+                if annotated
+                else ""
+            )
+            + " WHERE id = ?"
+        )
+        values: tuple[Any, ...] = tuple(columns.values())
+        iterator: Iterator[int] = iter(ids)
+        done: int = 0
+        with self.transaction() as conn:
+            while batch := list(islice(iterator, batch_size)):
+                conn.executemany(sql, ((*values, pair_id) for pair_id in batch))
+                done += len(batch)
+                yield done
+
+
+class RecordFilter:
+    """
+    records 表的筛选条件，各条件之间为“且”的关系，值为 None 的条件不参与筛选。
+    """
+
+    def __init__(
+        self,
+        weather: Optional[List[str]] = None,
+        temperature: tuple[Optional[float], Optional[float]] = (None, None),
+        humidity: tuple[Optional[float], Optional[float]] = (None, None),
+        time_range: tuple[Optional[str], Optional[str]] = (None, None),
+        features: Optional[List[str]] = None,
+        any_feature: bool = False,
+        annotated: Optional[bool] = None,
+        bbox: Optional[tuple[float, float, float, float]] = None,
+    ) -> None:
+        self.weather: Optional[List[str]] = weather
+        "天气，满足其中之一即可"
+
+        self.temperature: tuple[Optional[float], Optional[float]] = temperature
+        "温度范围（闭区间）"
+
+        self.humidity: tuple[Optional[float], Optional[float]] = humidity
+        "湿度范围（闭区间）"
+
+        self.time_range: tuple[Optional[str], Optional[str]] = time_range
+        '时间范围（闭区间），格式为 "YYYY-MM-DD HH:MM:SS"，可以只写前缀'
+
+        self.features: Optional[List[str]] = features
+        "地物类型"
+
+        self.any_feature: bool = any_feature
+        "为 True 时包含 features 中任意一种即可，否则需要全部包含"
+
+        self.annotated: Optional[bool] = annotated
+        "标注状态"
+
+        self.bbox: Optional[tuple[float, float, float, float]] = bbox
+        "拍摄位置范围 (最小经度, 最小纬度, 最大经度, 最大纬度)"
+
+    @staticmethod
+    def _range(
+        column: str, bounds: tuple[Any, Any], clauses: list[str], params: list[Any]
+    ) -> None:
+        low, high = bounds
+        if low is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(low)
+        if high is not None:
+            clauses.append(f"{column} <= ?")
+            params.append(high)
+
+    def feature_masks(self) -> list[int]:
+        """
+        返回满足地物类型条件的全部掩码。
+        掩码只有 256 种取值，展开为 IN 列表后可以直接在 feature_mask 索引上查找。
+        """
+        required: int = PicData.feature_to_mask(self.features or [])
+        return [
+            mask
+            for mask in range(1 << len(PicData.FEATURE_TYPE))
+            if (mask & required if self.any_feature else mask & required == required)
+        ]
+
+    def to_sql(self) -> tuple[str, list[Any]]:
+        """
+        返回 WHERE 子句和参数。
+        """
+        clauses: list[str] = []
+        params: list[Any] = []
+        if self.weather:
+            clauses.append(f"weather IN ({', '.join('?' for _ in self.weather)})")
+            params.extend(self.weather)
+        self._range("temperature", self.temperature, clauses, params)
+        self._range("humidity", self.humidity, clauses, params)
+        low, high = self.time_range
+        if high is not None:
+            # 前缀形式的上界包含以该前缀开头的全部时间
+            high += "\uffff"
+        self._range("time_stamp", (low, high), clauses, params)
+        if self.features:
+            masks: list[int] = self.feature_masks()
+            clauses.append(f"feature_mask IN ({', '.join(map(str, masks)) or 'NULL'})")
+        if self.annotated is not None:
+            clauses.append("status = ?")
+            params.append(STATUS_ANNOTATED if self.annotated else STATUS_UNANNOTATED)
+        if self.bbox is not None:
+            min_longitude, min_latitude, max_longitude, max_latitude = self.bbox
+            clauses.append(
+                "id IN (SELECT id FROM records_position "
+                "WHERE max_longitude >= ? AND min_longitude <= ? "
+                "AND max_latitude >= ? AND min_latitude <= ?)"
+            )
+            params.extend((min_longitude, max_longitude, min_latitude, max_latitude))
+            self._range("longitude", (min_longitude, max_longitude), clauses, params)
+            self._range("latitude", (min_latitude, max_latitude), clauses, params)
+        return (" AND ".join(clauses) or "1", params)
+
+
+class AnnotationWriter:
+    """
+    后台写入线程。
+    提交的标注先放入队列，同一个 Pair 的多次修改只保留最后一次，
+    队列达到 batch_size 条或距上次写入超过 interval 秒时在一个事务中批量写入。
+    关闭时会写入队列中剩余的全部修改。
+    """
+
+    def __init__(
+        self, db: Database, batch_size: int = 64, interval: float = 0.5
+    ) -> None:
+        self.db: Database = db
+        "数据库"
+
+        self.batch_size: int = batch_size
+        "触发写入的队列长度"
+
+        self.interval: float = interval
+        "最长写入间隔（秒）"
+
+        self._pending: dict[int, tuple] = {}
+        self._cond: threading.Condition = threading.Condition()
+        self._write_lock: threading.Lock = threading.Lock()
+        self._stop: bool = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        启动后台线程。
+        """
+        if self._thread is not None:
+            return
+        self._stop = False
+        self._thread = threading.Thread(
+            target=self._run, name="AnnotationWriter", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, pair: Pair) -> None:
+        """
+        将 Pair 的当前状态加入写入队列，立即返回。
+        """
+        if pair.id is None:
+            raise ValueError(f"{pair.original} 没有对应的数据库记录")
+        row: tuple = pair_to_row(pair)
+        with self._cond:
+            self._pending[pair.id] = row
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def pending(self, pair_id: int) -> Optional[tuple]:
+        """
+        返回尚未写入的修改（UPDATE_SQL 的参数），没有时返回 None。
+        """
+        with self._cond:
+            return self._pending.get(pair_id)
+
+    def flush(self) -> int:
+        """
+        在当前线程中立即写入队列中的全部修改。
+
+        Returns:
+            int: 写入的记录数。
+        """
+        with self._write_lock:
+            with self._cond:
+                batch: dict[int, tuple] = self._pending
+                self._pending = {}
+            if not batch:
+                return 0
+            try:
+                with self.db.transaction() as conn:
+                    conn.executemany(UPDATE_SQL, list(batch.values()))
+            except sqlite3.Error:
+                # 写入失败时放回队列，保留期间产生的更新的修改
+                with self._cond:
+                    batch.update(self._pending)
+                    self._pending = batch
+                raise
+            return len(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stop or len(self._pending) >= self.batch_size,
+                    timeout=self.interval,
+                )
+                stop: bool = self._stop
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"写入标注失败，稍后重试：{e}")
+            if stop:
+                return
+
+    def close(self) -> None:
+        """
+        停止后台线程并写入剩余的全部修改。
+        """
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+class PairRepository:
+    """
+    按需加载的 Pair 序列。
+    支持 len() 和下标访问，可以直接替代 to_pair 得到的列表：
+    记录总数通过 COUNT(*) 获得，Pair 按页从数据库读取并保存在 LRU 缓存中，
+    启动时不需要读取整个表。
+
+    相邻的页通过 id 做键集分页（WHERE id > ?），只有跳转到未访问过的页时才使用 OFFSET。
+    已加载的记录同时记录 id 到下标的映射，index_of 不需要对表计数。
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        writer: Optional[AnnotationWriter] = None,
+        page_size: int = 256,
+        cache_size: int = 4096,
+        scan_pages: int = 4,
+    ) -> None:
+        self.db: Database = db
+        "数据库"
+
+        self.writer: Optional[AnnotationWriter] = writer
+        "后台写入线程，读取时优先使用其中尚未写入的修改"
+
+        self.page_size: int = page_size
+        "每页的记录数"
+
+        self.scan_pages: int = scan_pages
+        "index_of 从附近的下标向后按页查找的最大页数"
+
+        self.cache: LRUCache[int, Pair] = LRUCache(max_size=cache_size)
+        "下标到 Pair 的缓存"
+
+        self._count: Optional[int] = None
+        self._page_last_id: LRUCache[int, int] = LRUCache(max_size=cache_size)
+        self._positions: LRUCache[int, int] = LRUCache(max_size=cache_size)
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = (
+                self.db.connection()
+                .execute("SELECT COUNT(*) FROM records")
+                .fetchone()[0]
+            )
+        return self._count
+
+    def __getitem__(self, index: int) -> Pair:
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Pair 下标超出范围")
+        pair: Optional[Pair] = self.cache.get(index)
+        if pair is not None:
+            return pair
+        with self._lock:
+            pair = self.cache.get(index)
+            if pair is None:
+                self._load_page(index // self.page_size)
+                pair = self.cache.get(index)
+        if pair is None:
+            raise IndexError("Pair 下标超出范围")
+        return pair
+
+    def __iter__(self) -> Iterator[Pair]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def refresh(self) -> None:
+        """
+        清空缓存并重新统计记录数，数据库被其他程序修改后调用。
+        """
+        with self._lock:
+            self._count = None
+            self.cache.clear()
+            self._page_last_id.clear()
+            self._positions.clear()
+
+    def _load_page(self, page: int) -> None:
+        conn: sqlite3.Connection = self.db.connection()
+        prev_last_id: Optional[int] = self._page_last_id.get(page - 1) if page else 0
+        if prev_last_id is not None:
+            rows: list[Tuple] = conn.execute(
+                f"SELECT id, {SELECT_COLUMNS} FROM records "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (prev_last_id, self.page_size),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"SELECT id, {SELECT_COLUMNS} FROM records "
+                "ORDER BY id LIMIT ? OFFSET ?",
+                (self.page_size, page * self.page_size),
+            ).fetchall()
+        if not rows:
+            return
+        self._page_last_id.put(page, rows[-1][0])
+        start: int = page * self.page_size
+        for offset, row in enumerate(rows):
+            pending: Optional[tuple] = (
+                self.writer.pending(row[0]) if self.writer is not None else None
+            )
+            if pending is not None:
+                row = (row[0],) + pending[:-1]
+            pair: Pair = Pair()
+            pair.load_from_tuple(row)
+            self.cache.put(start + offset, pair)
+            self._positions.put(row[0], start + offset)
+
+    def index_of(self, pair_id: int, near: Optional[int] = None) -> int:
+        """
+        返回 id 对应的记录的下标。
+        先查找已加载的记录；未加载时从 near 所在的页开始，用键集分页向后加载至多 scan_pages 页，
+        “下一张未标注”的记录通常就在当前位置之后；仍未找到时才使用 Database.index_of 计数。
+
+        Parameters:
+            pair_id (int): 记录的 id。
+            near (int, optional): 附近的下标，通常是当前显示的图像。
+
+        Returns:
+            int: 记录的下标。
+        """
+        index: Optional[int] = self._positions.get(pair_id)
+        if index is not None:
+            return index
+        if near is not None:
+            first_page: int = max(int(near), 0) // self.page_size
+            for page in range(first_page, first_page + self.scan_pages):
+                if page * self.page_size >= len(self):
+                    break
+                last_id: Optional[int] = self._page_last_id.get(page)
+                if last_id is None or pair_id <= last_id:
+                    with self._lock:
+                        self._load_page(page)
+                    index = self._positions.get(pair_id)
+                    if index is not None:
+                        return index
+                    last_id = self._page_last_id.get(page)
+                if last_id is None or pair_id <= last_id:
+                    break
+        index = self.db.index_of(pair_id)
+        self._positions.put(pair_id, index)
+        return index
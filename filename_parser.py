@@ -0,0 +1,282 @@
+"""
+filename_parser.py
+"""
+
+import re
+from typing import Any, Callable, Generic, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_DAYS_IN_MONTH: tuple[int, ...] = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+_NON_DIGIT: re.Pattern[str] = re.compile(r"\D")
+
+
+def normalize_timestamp(digits: str) -> Optional[str]:
+    """
+    将 YYYYMMDDHHMMSS 格式的 14 位数字转换为 "YYYY-MM-DD HH:MM:SS"。
+    校验规则与 datetime.strptime 一致，但不构造 datetime 对象。
+
+    Parameters:
+        digits (str): 14 位数字字符串。
+
+    Returns:
+        str | None: 格式化后的时间戳，日期或时间不合法时返回 None。
+    """
+    if len(digits) != 14 or not digits.isdigit():
+        return None
+    year: int = int(digits[0:4])
+    month: int = int(digits[4:6])
+    day: int = int(digits[6:8])
+    if not 1 <= month <= 12 or day < 1:
+        return None
+    max_day: int = _DAYS_IN_MONTH[month]
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        max_day = 29
+    if (
+        day > max_day
+        or int(digits[8:10]) > 23
+        or int(digits[10:12]) > 59
+        or int(digits[12:14]) > 59
+    ):
+        return None
+    return (
+        f"{digits[0:4]}-{digits[4:6]}-{digits[6:8]} "
+        f"{digits[8:10]}:{digits[10:12]}:{digits[12:14]}"
+    )
+
+
+def normalize_digits(text: str) -> Optional[str]:
+    """
+    去掉匹配结果中的非数字字符后调用 normalize_timestamp。
+    适用于 "YYYY-MM-DD-HH-MM-SS"、"YYYYMMDD_HHMMSS" 等只是分隔符不同的格式。
+    """
+    return normalize_timestamp(_NON_DIGIT.sub("", text))
+
+
+class PatternRegistry(Generic[T]):
+    """
+    编译后的正则规则表。
+    规则按注册顺序排列，返回第一条匹配的规则。
+
+    merge 为 True 时，所有规则会被合并为一个带命名分组的正则表达式，只需搜索一次。
+    此时若规则没有以 "^" 锚定，将返回字符串中最靠左的匹配，而不是注册顺序靠前的匹配。
+    """
+
+    def __init__(self, merge: bool = False) -> None:
+        self.merge: bool = merge
+        "是否合并为单个正则表达式"
+
+        self.rules: list[tuple[re.Pattern[str], T]] = []
+        "规则列表"
+
+        self._merged: Optional[re.Pattern[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def register(self, pattern: str, value: T, index: Optional[int] = None) -> None:
+        """
+        注册一条规则。
+
+        Parameters:
+            pattern (str): 正则表达式。
+            value (T): 规则匹配时返回的值。
+            index (int, optional): 插入位置，默认追加到末尾。
+        """
+        rule: tuple[re.Pattern[str], T] = (re.compile(pattern), value)
+        if index is None:
+            self.rules.append(rule)
+        else:
+            self.rules.insert(index, rule)
+        self._merged = None
+
+    def _compile_merged(self) -> re.Pattern[str]:
+        if self._merged is None:
+            self._merged = re.compile(
+                "|".join(
+                    f"(?P<_r{i}>{rule.pattern})"
+                    for i, (rule, _) in enumerate(self.rules)
+                )
+            )
+        return self._merged
+
+    def search(self, string: str) -> Optional[tuple[re.Match[str], T]]:
+        """
+        返回第一条匹配的规则的匹配结果和值，没有匹配时返回 None。
+        """
+        if not self.rules:
+            return None
+        if self.merge:
+            match: Optional[re.Match[str]] = self._compile_merged().search(string)
+            if match is None or match.lastgroup is None:
+                return None
+            return match, self.rules[int(match.lastgroup[2:])][1]
+        for rule, value in self.rules:
+            match = rule.search(string)
+            if match is not None:
+                return match, value
+        return None
+
+    def search_all(self, string: str) -> Iterator[tuple[re.Match[str], T]]:
+        """
+        按注册顺序返回每条规则的第一个匹配结果和值。
+        """
+        for rule, value in self.rules:
+            match: Optional[re.Match[str]] = rule.search(string)
+            if match is not None:
+                yield match, value
+
+
+class FilenameParser:
+    """
+    文件名解析器。
+    从文件名（不含后缀）中解析时间戳、天气、温度和图像类型，各类规则均可注册扩展。
+    """
+
+    def __init__(self, merge: bool = True) -> None:
+        self.time_rules: PatternRegistry[Callable[[str], Optional[str]]] = (
+            PatternRegistry(merge=False)
+        )
+        '时间戳规则，值为将匹配结果转换为 "YYYY-MM-DD HH:MM:SS" 的函数'
+
+        self.weather_rules: PatternRegistry[None] = PatternRegistry(merge=False)
+        "天气和温度规则，正则表达式需包含 weather 和 temperature 两个命名分组"
+
+        self.image_rules: PatternRegistry[str] = PatternRegistry(merge=merge)
+        '图像类型规则，值为 "IR" 或 "NR"'
+
+    @classmethod
+    def default(cls) -> "FilenameParser":
+        """
+        创建包含内置规则的解析器。
+        """
+        parser: FilenameParser = cls()
+
+        # YYYY-MM-DD-HH-MM-SS
+        parser.register_time_rule(r"20\d{2}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2}")
+        # YYYYMMDDHHMMSS
+        parser.register_time_rule(r"20\d{12}", normalize_timestamp)
+
+        # E1: 晴23
+        parser.register_weather_rule(
+            r"(?P<weather>[阴晴雨雪雾]|多云)[天]?\-?(?P<temperature>\d{1,2})$"
+        )
+
+        # 红外1
+        parser.register_vendor_rule(r"^IR", "IR")
+        # 红外2
+        parser.register_vendor_rule(r"^DJI_\d+_\d+_T", "IR")
+        # 原始1
+        parser.register_vendor_rule(r"^GREY_", "NR")
+        # 原始2
+        parser.register_vendor_rule(r"^DJI_\d+_\d+_V", "NR")
+        # 原始3
+        parser.register_vendor_rule(r"^DJI_\d+_\d+_S", "NR")
+        return parser
+
+    def register_time_rule(
+        self,
+        pattern: str,
+        normalizer: Callable[[str], Optional[str]] = normalize_digits,
+        index: Optional[int] = None,
+    ) -> None:
+        """
+        注册时间戳规则。规则按顺序尝试，匹配结果无法转换时继续尝试下一条规则。
+
+        Parameters:
+            pattern (str): 正则表达式。
+            normalizer (Callable, optional): 转换函数，默认为 normalize_digits。
+            index (int, optional): 插入位置，默认追加到末尾。
+        """
+        self.time_rules.register(pattern=pattern, value=normalizer, index=index)
+
+    def register_weather_rule(self, pattern: str, index: Optional[int] = None) -> None:
+        """
+        注册天气和温度规则。
+
+        Parameters:
+            pattern (str): 包含 weather 和 temperature 两个命名分组的正则表达式。
+            index (int, optional): 插入位置，默认追加到末尾。
+        """
+        groups: dict[str, int] = re.compile(pattern).groupindex
+        if "weather" not in groups or "temperature" not in groups:
+            raise ValueError("天气规则必须包含 weather 和 temperature 命名分组")
+        self.weather_rules.register(pattern=pattern, value=None, index=index)
+
+    def register_vendor_rule(
+        self,
+        pattern: str,
+        img_type: str,
+        index: Optional[int] = None,
+    ) -> None:
+        """
+        注册图像类型规则，用于支持新的相机命名方式。
+
+        Parameters:
+            pattern (str): 正则表达式，建议以 "^" 锚定。
+            img_type (str): 图像类型，"IR" 表示红外图像，"NR" 表示原始图像。
+            index (int, optional): 插入位置，默认追加到末尾。
+        """
+        if img_type not in ("IR", "NR"):
+            raise ValueError(f"未知的图像类型：{img_type}")
+        self.image_rules.register(pattern=pattern, value=img_type, index=index)
+
+    def parse(self, stem: str) -> dict[str, Any]:
+        """
+        解析文件名。
+
+        Parameters:
+            stem (str): 不含后缀的文件名。
+
+        Returns:
+            dict (str, str): 包含 time_stamp、weather、temperature、img_type 四个键，
+                无法匹配的项为空字符串。
+        """
+        time_stamp: str = ""
+        for match, normalizer in self.time_rules.search_all(stem):
+            result: Optional[str] = normalizer(match.group())
+            if result is not None:
+                time_stamp = result
+                break
+
+        weather_str: str = ""
+        temperature_str: str = ""
+        weather_match = self.weather_rules.search(stem)
+        if weather_match is not None:
+            weather_str = weather_match[0].group("weather")
+            temperature_str = weather_match[0].group("temperature")
+
+        image_match = self.image_rules.search(stem)
+        img_type: str = image_match[1] if image_match is not None else ""
+
+        return {
+            "time_stamp": time_stamp,
+            "weather": weather_str,
+            "temperature": temperature_str,
+            "img_type": img_type,
+        }
+
+
+PARSER: FilenameParser = FilenameParser.default()
+"默认解析器"
+
+
+def register_time_rule(
+    pattern: str,
+    normalizer: Callable[[str], Optional[str]] = normalize_digits,
+    index: Optional[int] = None,
+) -> None:
+    """
+    向默认解析器注册时间戳规则，参见 FilenameParser.register_time_rule。
+    """
+    PARSER.register_time_rule(pattern=pattern, normalizer=normalizer, index=index)
+
+
+def register_vendor_rule(
+    pattern: str, img_type: str, index: Optional[int] = None
+) -> None:
+    """
+    向默认解析器注册图像类型规则，参见 FilenameParser.register_vendor_rule。
+    使用进程池解析时，需在子进程也会导入的模块中注册，否则子进程中不生效。
+    """
+    PARSER.register_vendor_rule(pattern=pattern, img_type=img_type, index=index)
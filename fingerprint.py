@@ -0,0 +1,201 @@
+"""
+fingerprint.py
+"""
+
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+CREATE_TABLE_SQL: str = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+CREATE_INDEX_SQL: str = (
+    "CREATE INDEX IF NOT EXISTS idx_fingerprints_hash ON fingerprints (hash)"
+)
+
+
+def fingerprint(path: Path, size: int, block_size: int = 1 << 16) -> str:
+    """
+    计算文件的快速指纹：对文件大小以及开头和结尾各 block_size 字节做 BLAKE2b 哈希。
+    小于 2 * block_size 的文件会被完整读取。
+
+    Parameters:
+        path (Path): 文件路径。
+        size (int): 文件大小。
+        block_size (int, optional): 读取的块大小，默认为 64K。
+
+    Returns:
+        str: 32 位十六进制指纹。
+    """
+    digest = hashlib.blake2b(size.to_bytes(8, "little"), digest_size=16)
+    with open(file=path, mode="rb") as f:
+        if size <= 2 * block_size:
+            digest.update(f.read())
+        else:
+            digest.update(f.read(block_size))
+            f.seek(-block_size, os.SEEK_END)
+            digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+class FingerprintStore:
+    """
+    文件指纹缓存，保存在数据库的 fingerprints 表中。
+    以文件路径为键记录大小、修改时间和指纹，大小和修改时间未变的文件不会重新读取。
+    """
+
+    def __init__(self, database_file: Path, root: Path = Path(".")) -> None:
+        self.database_file: Path = database_file
+        "数据库文件"
+
+        self.root: Path = root
+        "路径的根目录"
+
+        self.entries: dict[str, tuple[int, int, str]] = {}
+        "路径到 (大小, 修改时间, 指纹) 的缓存"
+
+        self.seen: dict[str, tuple[int, int, str]] = {}
+        "本次计算过的文件"
+
+        self.changed: list[str] = []
+        "路径不变但内容发生变化的文件"
+
+        self.hits: int = 0
+        "命中缓存的文件数"
+
+        self.misses: int = 0
+        "重新计算指纹的文件数"
+
+    def load(self) -> None:
+        """
+        从数据库读取缓存，数据库或表不存在时使用空缓存。
+        """
+        self.entries = {}
+        if not self.database_file.is_file():
+            return
+        conn: sqlite3.Connection = sqlite3.connect(self.database_file)
+        try:
+            self.entries = {
+                row[0]: (row[1], row[2], row[3])
+                for row in conn.execute(
+                    "SELECT path, size, mtime_ns, hash FROM fingerprints"
+                )
+            }
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.close()
+
+    def save(self) -> None:
+        """
+        将本次计算过的文件写入数据库，未出现的文件会被移除。
+        """
+        conn: sqlite3.Connection = sqlite3.connect(self.database_file)
+        try:
+            with conn:
+                conn.execute(CREATE_TABLE_SQL)
+                conn.execute(CREATE_INDEX_SQL)
+                conn.execute("DELETE FROM fingerprints")
+                conn.executemany(
+                    "INSERT INTO fingerprints VALUES (?, ?, ?, ?)",
+                    ((path, *entry) for path, entry in self.seen.items()),
+                )
+        finally:
+            conn.close()
+
+    def _compute(self, key: str) -> Optional[tuple[int, int, str]]:
+        path: Path = self.root / key
+        try:
+            stat: os.stat_result = path.stat()
+            cached: Optional[tuple[int, int, str]] = self.entries.get(key)
+            if (
+                cached is not None
+                and cached[0] == stat.st_size
+                and cached[1] == stat.st_mtime_ns
+            ):
+                return cached
+            return (
+                stat.st_size,
+                stat.st_mtime_ns,
+                fingerprint(path=path, size=stat.st_size),
+            )
+        except OSError:
+            return None
+
+    def compute(self, keys: Iterable[str], workers: int = 16) -> dict[str, str]:
+        """
+        在线程池中计算文件指纹。
+
+        Parameters:
+            keys (Iterable[str]): 相对于 root 的文件路径。
+            workers (int, optional): 线程数，默认为 16。
+
+        Returns:
+            dict[str, str]: 路径到指纹的映射，无法读取的文件不包含在内。
+        """
+        keys = list(keys)
+        result: dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for key, entry in zip(keys, executor.map(self._compute, keys)):
+                if entry is None:
+                    continue
+                cached: Optional[tuple[int, int, str]] = self.entries.get(key)
+                if cached is entry:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    if cached is not None and cached[2] != entry[2]:
+                        self.changed.append(key)
+                self.seen[key] = entry
+                result[key] = entry[2]
+        return result
+
+
+def dedup_frames(
+    infos: Iterable[dict[str, Any]], store: FingerprintStore, workers: int = 16
+) -> tuple[list[dict[str, Any]], list[dict[str, str]]]:
+    """
+    按内容指纹去除重复的图像。每组重复图像优先保留已在指纹缓存中的路径，
+    使重新导入的副本不会改变已有记录的路径，其余情况保留路径最小的一张。
+    保留的图像信息中会加入 "hash" 键。
+
+    Parameters:
+        infos (Iterable[dict[str, Any]]): yield_info 返回的图像信息。
+        store (FingerprintStore): 指纹缓存，需要先调用 load。
+        workers (int, optional): 计算指纹的线程数，默认为 16。
+
+    Returns:
+        tuple[list[dict[str, Any]], list[dict[str, str]]]:
+            按路径排序的去重后的图像信息，以及被去除的图像 {"file": 路径, "duplicate_of": 保留的路径}。
+    """
+    frames: list[dict[str, Any]] = sorted(infos, key=lambda info: str(info["file"]))
+    hashes: dict[str, str] = store.compute(
+        (str(info["file"]) for info in frames), workers=workers
+    )
+    kept: dict[str, str] = {}
+    for info in sorted(frames, key=lambda info: str(info["file"]) not in store.entries):
+        key: str = str(info["file"])
+        digest: Optional[str] = hashes.get(key)
+        if digest is not None and digest not in kept:
+            kept[digest] = key
+    unique: list[dict[str, Any]] = []
+    duplicates: list[dict[str, str]] = []
+    for info in frames:
+        key = str(info["file"])
+        digest = hashes.get(key)
+        if digest is None:
+            unique.append(info)
+        elif kept[digest] == key:
+            unique.append({**info, "hash": digest})
+        else:
+            duplicates.append({"file": key, "duplicate_of": kept[digest]})
+    return (unique, duplicates)
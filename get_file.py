@@ -2,18 +2,33 @@
 get info
 """
 
+import argparse
 import json
+import os
+import queue
 import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
 from datetime import datetime
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Generator, List, Literal, Optional
+from typing import Any, Generator, Iterable, Iterator, List, Literal, Optional
 
-from convert import convert_to_sqlite
+from convert import convert_to_sqlite, iter_json_array, merge_to_sqlite
+from filename_parser import PARSER, FilenameParser
+from fingerprint import FingerprintStore, dedup_frames
+from metadata import read_metadata_chunk
 
 
 class PicData:
     """
     图像数据类。
+
+    使用 __slots__ 存储，地物类型保存为 FEATURE_TYPE 上的 8 位掩码，
+    天气保存为 WEATHER_CODES 中的下标，读写接口与普通属性相同。
     """
 
     WEATHER_REDIRECT: dict[str, str] = {
@@ -25,6 +40,17 @@ class PicData:
         "雾": "foggy",
     }
 
+    WEATHER_CODES: tuple[str, ...] = (
+        "",
+        "sunny",
+        "overcast",
+        "cloudy",
+        "rainy",
+        "snowy",
+        "foggy",
+    )
+    "天气编码，下标即编码，0 表示未设置"
+
     FEATURE_TYPE: list[str] = [
         "forest",
         "water",
@@ -36,36 +62,66 @@ class PicData:
         "beach",
     ]
 
+    FIELDS: tuple[str, ...] = (
+        "time_stamp",
+        "feature",
+        "shooting_position",
+        "wind_dir",
+        "wind_scale",
+        "wind_speed",
+        "humidity",
+        "precip",
+        "pressure",
+        "vis",
+        "cloud",
+        "AS",
+        "HS",
+        "weather",
+        "temperature",
+    )
+    "dump() 输出的字段及其顺序"
+
+    __slots__ = (
+        "time_stamp",
+        "_weather",
+        "_temperature",
+        "_feature",
+        "_feature_raw",
+        "_longitude",
+        "_latitude",
+        "wind_dir",
+        "wind_scale",
+        "wind_speed",
+        "humidity",
+        "precip",
+        "pressure",
+        "vis",
+        "cloud",
+        "AS",
+        "HS",
+    )
+
     def __init__(self) -> None:
         self.time_stamp: str = ""
         "时间戳"
 
-        self._weather: Optional[
-            Literal["sunny", "overcast", "cloudy", "rainy", "snowy", "foggy"]
-        ] = None
-        "天气"
+        self._weather: int | str = 0
+        "天气编码，无法识别的天气保存原始字符串"
 
         self._temperature: Optional[int] = None
         "温度"
 
-        self.feature: Optional[
-            List[
-                Literal[
-                    "forest",
-                    "water",
-                    "grass",
-                    "bare",
-                    "farmland",
-                    "road",
-                    "building",
-                    "beach",
-                ]
-            ]
-        ] = None
-        "地物类型"
+        self._feature: int = -1
+        "地物类型掩码，-1 表示未设置"
 
-        self.shooting_position: tuple[float, float] = (0.0, 0.0)
-        "拍摄位置"
+        self._feature_raw: tuple[str, ...] = ()
+        "无法识别的地物类型，按原样保存"
+
+        self._longitude: float = 0.0
+        "拍摄位置（经度）"
+
+        self._latitude: float = 0.0
+        "拍摄位置（纬度）"
 
         self.wind_dir: str = ""
         "风向"
@@ -97,27 +153,133 @@ class PicData:
 
     def __repr__(self) -> str:
         name: str = self.__class__.__name__
-        dict_str: str = ", ".join(
-            f"{k}={v}" for k, v in self.__dict__.items() if not k.startswith("_")
-        )
-        dict_str += f", weather={self._weather}, temperature={self._temperature}"
+        dict_str: str = ", ".join(f"{k}={getattr(self, k)}" for k in self.FIELDS)
         return f"{name}({dict_str})"
 
+    @staticmethod
+    def feature_to_mask(feature: Optional[Iterable[str]]) -> int:
+        """
+        将地物类型列表转换为掩码，None 转换为 -1，用于校验输入，存在未知的地物类型时抛出 ValueError。
+        """
+        if feature is None:
+            return -1
+        mask: int = 0
+        for name in feature:
+            try:
+                mask |= 1 << PicData.FEATURE_TYPE.index(name)
+            except ValueError as e:
+                raise ValueError(f"未知的地物类型：{name}") from e
+        return mask
+
+    @staticmethod
+    def mask_to_feature(mask: int) -> Optional[List[str]]:
+        """
+        将掩码转换为地物类型列表，-1 转换为 None。
+        """
+        if mask < 0:
+            return None
+        return [name for i, name in enumerate(PicData.FEATURE_TYPE) if mask >> i & 1]
+
+    @property
+    def feature(
+        self,
+    ) -> Optional[
+        List[
+            Literal[
+                "forest",
+                "water",
+                "grass",
+                "bare",
+                "farmland",
+                "road",
+                "building",
+                "beach",
+            ]
+        ]
+    ]:
+        """
+        地物类型，按 FEATURE_TYPE 的顺序返回新的列表，无法识别的地物类型排在最后，
+        修改返回的列表不会改变数据。
+        """
+        feature: Optional[List[str]] = self.mask_to_feature(self._feature)
+        if feature is None:
+            return None
+        return feature + list(self._feature_raw)  # type: ignore
+
+    @feature.setter
+    def feature(self, value: Optional[Iterable[str]]) -> None:
+        # 与天气相同，无法识别的地物类型（旧数据或手工修改的记录）按原样保存，
+        # 读取数据库时不会因此失败；GUI 输入由 feature_to_mask 校验
+        if value is None:
+            self._feature = -1
+            self._feature_raw = ()
+            return
+        value = list(value)
+        self._feature = self.feature_to_mask(
+            [name for name in value if name in self.FEATURE_TYPE]
+        )
+        self._feature_raw = tuple(
+            dict.fromkeys(name for name in value if name not in self.FEATURE_TYPE)
+        )
+
+    @property
+    def feature_raw(self) -> tuple[str, ...]:
+        """
+        无法识别的地物类型，不计入 feature_mask。
+        """
+        return self._feature_raw
+
+    @property
+    def feature_mask(self) -> int:
+        """
+        地物类型掩码，第 i 位对应 FEATURE_TYPE[i]，-1 表示未设置。
+        """
+        return self._feature
+
+    @feature_mask.setter
+    def feature_mask(self, value: int) -> None:
+        if not -1 <= value < 1 << len(self.FEATURE_TYPE):
+            raise ValueError(f"地物类型掩码超出范围：{value}")
+        self._feature = value
+        self._feature_raw = ()
+
+    @property
+    def shooting_position(self) -> tuple[float, float]:
+        """
+        拍摄位置
+        """
+        return (self._longitude, self._latitude)
+
+    @shooting_position.setter
+    def shooting_position(self, value: Iterable[float]) -> None:
+        self._longitude, self._latitude = value
+
     @property
     def weather(self) -> str:
         """
         天气
         """
-        if self._weather is None:
-            return ""
-        result: str = self.WEATHER_REDIRECT.get(self._weather, "")
-        if not result:
+        if isinstance(self._weather, str):
             return self._weather
-        return result
+        return self.WEATHER_CODES[self._weather]
 
     @weather.setter
-    def weather(self, value: str) -> None:
-        self._weather = value  # pylint: disable=attribute-defined-outside-init   #type: ignore
+    def weather(self, value: Optional[str]) -> None:
+        if not value:
+            self._weather = 0
+            return
+        value = self.WEATHER_REDIRECT.get(value, value)
+        try:
+            self._weather = self.WEATHER_CODES.index(value)
+        except ValueError:
+            self._weather = value
+
+    @property
+    def weather_code(self) -> int:
+        """
+        天气编码，WEATHER_CODES 中的下标，无法识别的天气为 -1。
+        """
+        return self._weather if isinstance(self._weather, int) else -1
 
     @property
     def temperature(self) -> Optional[int]:
@@ -136,25 +298,25 @@ class PicData:
         """
         将数据转换为字典。
         """
-        data: dict[str, Any] = {}
-        for k, v in self.__dict__.items():
-            if not k.startswith("_"):
-                data[k] = v
-        data["weather"] = self.weather
-        data["temperature"] = self.temperature
-        return data
+        return {k: getattr(self, k) for k in self.FIELDS}
 
 
 class Pair:
     """
     图像对类。
+    路径以字符串形式存储，读取 original 和 processed 时返回 Path。
     """
 
+    __slots__ = ("id", "_original", "_processed", "data")
+
     def __init__(self) -> None:
-        self.original: Path = Path()
+        self.id: Optional[int] = None
+        "数据库主键"
+
+        self._original: str = "."
         "原始文件路径"
 
-        self.processed: Path = Path()
+        self._processed: str = "."
         "处理后文件路径"
 
         self.data: PicData = PicData()
@@ -164,13 +326,35 @@ class Pair:
         s: str = f"Pair(original={self.original}, processed={self.processed}, data={self.data})"
         return s
 
+    @property
+    def original(self) -> Path:
+        """
+        原始文件路径
+        """
+        return Path(self._original)
+
+    @original.setter
+    def original(self, value: Path | str) -> None:
+        self._original = str(value if isinstance(value, Path) else Path(value))
+
+    @property
+    def processed(self) -> Path:
+        """
+        处理后文件路径
+        """
+        return Path(self._processed)
+
+    @processed.setter
+    def processed(self, value: Path | str) -> None:
+        self._processed = str(value if isinstance(value, Path) else Path(value))
+
     def dump(self) -> dict[str, Any]:
         """
         将数据转换为字典。
         """
         data: dict[str, Any] = {}
-        data["original"] = str(self.original)
-        data["processed"] = str(self.processed)
+        data["original"] = self._original
+        data["processed"] = self._processed
         data.update(self.data.dump())
         return data
 
@@ -178,8 +362,9 @@ class Pair:
         """
         从字典中加载数据。
         """
-        self.original = Path(data[1])
-        self.processed = Path(data[2])
+        self.id = data[0]
+        self.original = data[1]
+        self.processed = data[2]
         self.data = PicData()
         self.data.time_stamp = data[3]
         self.data.feature = json.loads(data[4]) if data[4] else None
@@ -198,8 +383,167 @@ class Pair:
         self.data.temperature = int(data[17]) if data[17] else None
 
 
+class PairColumns:
+    """
+    列式存储的 Pair 集合。
+    数值字段保存在 array 中，适合在内存中保存大量 Pair；
+    下标访问时返回新构造的 Pair，修改它不会改变集合中的数据，需要通过 __setitem__ 写回。
+    """
+
+    _NO_TEMPERATURE: int = -(2**31)
+
+    def __init__(self, pairs: Iterable[Pair] = ()) -> None:
+        self.ids: array = array("q")
+        "数据库主键，-1 表示 None"
+
+        self.original: list[str] = []
+        "原始文件路径"
+
+        self.processed: list[str] = []
+        "处理后文件路径"
+
+        self.time_stamp: list[str] = []
+        "时间戳"
+
+        self.feature: array = array("h")
+        "地物类型掩码"
+
+        self.feature_raw: dict[int, tuple[str, ...]] = {}
+        "无法识别的地物类型"
+
+        self.weather: array = array("b")
+        "天气编码，-1 表示无法识别的天气，原始字符串保存在 weather_raw 中"
+
+        self.weather_raw: dict[int, str] = {}
+        "无法识别的天气"
+
+        self.temperature: array = array("i")
+        "温度"
+
+        self.longitude: array = array("d")
+        "拍摄位置（经度）"
+
+        self.latitude: array = array("d")
+        "拍摄位置（纬度）"
+
+        self.wind_dir: list[str] = []
+        "风向"
+
+        self.ints: dict[str, array] = {
+            k: array("q")
+            for k in (
+                "wind_scale",
+                "wind_speed",
+                "humidity",
+                "pressure",
+                "vis",
+                "cloud",
+            )
+        }
+        "整数字段"
+
+        self.floats: dict[str, array] = {k: array("d") for k in ("precip", "AS", "HS")}
+        "浮点数字段"
+
+        self._wind_dirs: dict[str, str] = {}
+
+        self.extend(pairs)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Pair]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index: int) -> Pair:
+        if index < 0:
+            index += len(self)
+        pair: Pair = Pair()
+        pair.id = self.ids[index] if self.ids[index] >= 0 else None
+        pair.original = self.original[index]
+        pair.processed = self.processed[index]
+        data: PicData = pair.data
+        data.time_stamp = self.time_stamp[index]
+        data.feature_mask = self.feature[index]
+        if index in self.feature_raw:
+            data.feature = [*(data.feature or []), *self.feature_raw[index]]
+        code: int = self.weather[index]
+        data.weather = (
+            self.weather_raw[index] if code < 0 else PicData.WEATHER_CODES[code]
+        )
+        temperature: int = self.temperature[index]
+        data.temperature = None if temperature == self._NO_TEMPERATURE else temperature
+        data.shooting_position = (self.longitude[index], self.latitude[index])
+        data.wind_dir = self.wind_dir[index]
+        for k, column in self.ints.items():
+            setattr(data, k, column[index])
+        for k, column in self.floats.items():
+            setattr(data, k, column[index])
+        return pair
+
+    def __setitem__(self, index: int, pair: Pair) -> None:
+        if index < 0:
+            index += len(self)
+        data: PicData = pair.data
+        self.ids[index] = pair.id if pair.id is not None else -1
+        self.original[index] = str(pair.original)
+        self.processed[index] = str(pair.processed)
+        self.time_stamp[index] = data.time_stamp
+        self.feature[index] = data.feature_mask
+        if data.feature_raw:
+            self.feature_raw[index] = data.feature_raw
+        else:
+            self.feature_raw.pop(index, None)
+        self.weather[index] = data.weather_code
+        if data.weather_code < 0:
+            self.weather_raw[index] = data.weather
+        else:
+            self.weather_raw.pop(index, None)
+        self.temperature[index] = (
+            data.temperature if data.temperature is not None else self._NO_TEMPERATURE
+        )
+        self.longitude[index], self.latitude[index] = data.shooting_position
+        # 风向的取值很少，共享同一个字符串对象
+        self.wind_dir[index] = self._wind_dirs.setdefault(data.wind_dir, data.wind_dir)
+        for k, column in self.ints.items():
+            column[index] = int(getattr(data, k))
+        for k, column in self.floats.items():
+            column[index] = float(getattr(data, k))
+
+    def append(self, pair: Pair) -> None:
+        """
+        在末尾添加一个 Pair。
+        """
+        self.ids.append(-1)
+        self.original.append("")
+        self.processed.append("")
+        self.time_stamp.append("")
+        self.feature.append(-1)
+        self.weather.append(0)
+        self.temperature.append(self._NO_TEMPERATURE)
+        self.longitude.append(0.0)
+        self.latitude.append(0.0)
+        self.wind_dir.append("")
+        for column in self.ints.values():
+            column.append(0)
+        for column in self.floats.values():
+            column.append(0.0)
+        self[len(self) - 1] = pair
+
+    def extend(self, pairs: Iterable[Pair]) -> None:
+        """
+        在末尾添加多个 Pair。
+        """
+        for pair in pairs:
+            self.append(pair)
+
+
 def yield_file(
-    path: Path, pattern: str = "**/*.*", suffix: Optional[list[str]] = None
+    path: Path,
+    pattern: str = "**/*.*",
+    suffix: Optional[list[str]] = None,
+    seen: Optional[set[str]] = None,
 ) -> Generator[Path, Any, None]:
     """
     遍历指定路径下的文件，并返回满足特定后缀条件的文件。
@@ -210,6 +554,8 @@ def yield_file(
         path (Path): 需要遍历的路径。
         pattern (str, optional): 用于匹配文件的模式，默认为"**/*.*"，表示匹配所有文件。
         suffix (list, optional): 需要返回的文件的后缀列表，默认为空列表，表示返回所有类型的文件。
+        seen (set[str], optional): 不为 None 时，将遍历到的文件的绝对路径加入其中，
+            供 validate_pairs 使用，避免再次调用 stat。
 
     Yields:
         Path: 返回满足条件的文件路径。
@@ -217,19 +563,22 @@ def yield_file(
     for file in path.glob(pattern=pattern):
         if suffix and file.suffix.lower() not in suffix:
             continue
+        if seen is not None:
+            seen.add(str(file.absolute()))
         yield file
 
 
 def yield_info(
-    generator: Generator[Path, Any, None],
+    generator: Iterable[Path],
+    parser: Optional[FilenameParser] = None,
 ) -> Generator[dict[str, Any], Any, None]:
     """
     该函数用于从生成器中获取文件信息，包括时间戳、天气和温度。
-    它首先定义了两个正则表达式模式来匹配时间戳，然后定义了另一个正则表达式模式来匹配天气和温度。
-    对于生成器中的每个文件，它会尝试匹配这些模式，并将结果存储在字典中。
+    文件名的解析由 filename_parser 中预编译的规则完成，可通过 register_vendor_rule 等函数扩展。
 
     Parameters:
-        generator (Generator[Path, Any, None]): 一个生成器，其元素是Path对象，表示文件路径。
+        generator (Iterable[Path]): 文件路径的可迭代对象。
+        parser (FilenameParser, optional): 文件名解析器，默认为 filename_parser.PARSER。
 
     Yields:
         dict (str, str | Path): 返回一个字典，包含以下键：
@@ -239,190 +588,791 @@ def yield_info(
             'temperature': 温度，如果无法匹配到温度，则为空字符串。
             'img_type': 图像类型，如果无法匹配到图像类型，则为空字符串。
     """
-    # 匹配时间戳
-    time_case: list[tuple[str, str]] = [
-        # YYYY-MM-DD-HH-MM-SS
-        (r"20\d{2}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2}", "%Y-%m-%d-%H-%M-%S"),
-        # YYYYMMDDHHMMSS
-        (r"20\d{12}", "%Y%m%d%H%M%S"),
-    ]
+    parser = parser or PARSER
+    root: Path = Path(__file__).parent
+    for file in generator:
+        result: dict[str, Any] = {"file": file.absolute().relative_to(root)}
+        result.update(parser.parse(file.stem))
+        yield result
 
-    # 匹配天气和温度
-    weather_case: list[tuple[str, str, str]] = [
-        # E1: 晴23
-        (r"(?:[阴晴雨雪雾]|多云)[天]?\-?\d{1,2}$", r"[阴晴雨雪雾]|多云", r"\d{1,2}$")
-    ]
 
-    # 匹配图像类型
-    image_case: list[tuple[str, str]] = [
-        # 红外1
-        (r"^IR", "IR"),
-        # 红外2
-        (r"^DJI_\d+_\d+_T", "IR"),
-        # 原始1
-        (r"^GREY_", "NR"),
-        # 原始2
-        (r"^DJI_\d+_\d+_V", "NR"),
-        # 原始3
-        (r"^DJI_\d+_\d+_S", "NR"),
-    ]
+def yield_file_parallel(
+    path: Path,
+    suffix: Optional[list[str]] = None,
+    workers: int = 8,
+    max_queue: int = 1024,
+    seen: Optional[set[str]] = None,
+) -> Generator[Path, Any, None]:
+    """
+    并行版本的 yield_file。
+    使用线程池对各个目录并发执行 os.scandir，适用于网络存储等 I/O 延迟较高的场景。
+    与 yield_file 的默认模式 "**/*.*" 相同，只返回文件名中带有 "." 的文件，但返回顺序不固定。
 
-    for file in generator:
-        time_stamp: str = ""
-        weather_str: str = ""
-        temperature_str: str = ""
-        img_type: str = ""
-
-        for pattern, time_format in time_case:
-            re_result: list[str] = re.findall(pattern=pattern, string=str(file.stem))
-            if not re_result:
-                continue
+    Parameters:
+        path (Path): 需要遍历的路径。
+        suffix (list, optional): 需要返回的文件的后缀列表，默认为空列表，表示返回所有类型的文件。
+        workers (int, optional): 线程数，默认为 8。
+        max_queue (int, optional): 已找到但尚未被消费的文件数上限，默认为 1024。
+        seen (set[str], optional): 不为 None 时，将确认为普通文件的绝对路径加入其中，
+            供 validate_pairs 使用，避免再次调用 stat。
+
+    Yields:
+        Path: 返回满足条件的文件的绝对路径。
+    """
+    done: object = object()
+    results: queue.Queue = queue.Queue(maxsize=max_queue)
+    stop: threading.Event = threading.Event()
+    lock: threading.Lock = threading.Lock()
+    pending: list[int] = [1]
+
+    def put(item: Any) -> None:
+        while not stop.is_set():
             try:
-                time_obj: datetime = datetime.strptime(re_result[0], time_format)
-            except ValueError:
+                results.put(item, timeout=0.1)
+                return
+            except queue.Full:
                 continue
 
-            time_stamp: str = time_obj.strftime("%Y-%m-%d %H:%M:%S")
-            break
+    def scan(directory: str) -> None:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if stop.is_set():
+                        return
+                    if entry.is_dir(follow_symlinks=False):
+                        with lock:
+                            pending[0] += 1
+                        executor.submit(scan, entry.path)
+                        continue
+                    if "." not in entry.name or not entry.is_file():
+                        continue
+                    if suffix and os.path.splitext(entry.name)[1].lower() not in suffix:
+                        continue
+                    if seen is not None:
+                        seen.add(entry.path)
+                    put(Path(entry.path))
+        except OSError:
+            pass
+        finally:
+            with lock:
+                pending[0] -= 1
+                finished: bool = pending[0] == 0
+            if finished:
+                put(done)
+
+    executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        executor.submit(scan, os.path.abspath(path))
+        while True:
+            item: Any = results.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _parse_chunk(files: list[Path]) -> list[dict[str, Any]]:
+    """
+    在子进程中解析一批文件。
+    """
+    return list(yield_info(generator=files))
 
-        for total, w_pattern, t_pattern in weather_case:
-            re_result: list[str] = re.findall(pattern=total, string=str(file.stem))
-            if not re_result:
-                continue
-            weather_str: str = re.findall(pattern=w_pattern, string=re_result[0])[0]
-            temperature_str: str = re.findall(pattern=t_pattern, string=re_result[0])[0]
-            break
 
-        for pattern, itype in image_case:
-            re_result: list[str] = re.findall(pattern=pattern, string=str(file.stem))
-            if not re_result:
+def yield_info_parallel(
+    generator: Iterable[Path],
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    max_in_flight: Optional[int] = None,
+) -> Generator[dict[str, Any], Any, None]:
+    """
+    并行版本的 yield_info。
+    将文件按批次分发到进程池中解析，并按输入顺序返回结果。
+
+    Parameters:
+        generator (Iterable[Path]): 文件路径的可迭代对象。
+        workers (int, optional): 进程数，默认为 CPU 核心数。
+        chunk_size (int, optional): 每批文件数，默认为 256。
+        max_in_flight (int, optional): 同时提交的批次数上限，默认为进程数的 2 倍。
+
+    Yields:
+        dict (str, str | Path): 与 yield_info 相同。
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    futures: deque[Future] = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunk: list[Path] = []
+        for file in generator:
+            chunk.append(file)
+            if len(chunk) < chunk_size:
                 continue
-            img_type: str = itype
-            break
-
-        result: dict[str, Any] = {
-            "file": file.absolute().relative_to(Path(__file__).parent),
-            "time_stamp": time_stamp if time_stamp else "",
-            "weather": weather_str if weather_str else "",
-            "temperature": temperature_str if temperature_str else "",
-            "img_type": img_type if img_type else "",
+            futures.append(executor.submit(_parse_chunk, chunk))
+            chunk = []
+            while len(futures) >= max_in_flight:
+                yield from futures.popleft().result()
+        if chunk:
+            futures.append(executor.submit(_parse_chunk, chunk))
+        while futures:
+            yield from futures.popleft().result()
+
+
+class Manifest:
+    """
+    文件清单缓存。
+    以文件路径为键，记录文件大小、修改时间以及解析得到的信息，
+    增量扫描时只对新增或发生变化的文件重新解析。
+    """
+
+    VERSION: int = 1
+
+    def __init__(self, manifest_file: Path) -> None:
+        self.manifest_file: Path = manifest_file
+        "清单文件路径"
+
+        self.entries: dict[str, dict[str, Any]] = {}
+        "清单条目"
+
+        self.seen: set[str] = set()
+        "本次扫描中出现过的文件"
+
+        self.hits: int = 0
+        "命中缓存的文件数"
+
+        self.misses: int = 0
+        "重新解析的文件数"
+
+    def load(self) -> None:
+        """
+        读取清单文件，文件不存在或版本不符时使用空清单。
+        """
+        self.entries = {}
+        if not self.manifest_file.is_file():
+            return
+        try:
+            with open(file=self.manifest_file, mode="r", encoding="utf-8") as f:
+                data: dict[str, Any] = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != self.VERSION:
+            return
+        self.entries = data.get("files", {})
+
+    def save(self) -> None:
+        """
+        写入清单文件。先写入临时文件再替换，避免中断时损坏清单。
+        """
+        data: dict[str, Any] = {"version": self.VERSION, "files": self.entries}
+        tmp_file: Path = self.manifest_file.with_suffix(".tmp")
+        with open(file=tmp_file, mode="w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, self.manifest_file)
+
+    def lookup(self, key: str, stat: os.stat_result) -> Optional[dict[str, Any]]:
+        """
+        查询文件的缓存信息，大小或修改时间不一致时返回 None。
+        """
+        self.seen.add(key)
+        entry: Optional[dict[str, Any]] = self.entries.get(key)
+        if (
+            entry is None
+            or entry["size"] != stat.st_size
+            or entry["mtime_ns"] != stat.st_mtime_ns
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["info"]
+
+    def update(self, key: str, stat: os.stat_result, info: dict[str, Any]) -> None:
+        """
+        更新文件的缓存信息。
+        """
+        self.seen.add(key)
+        self.entries[key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "info": {k: v for k, v in info.items() if k != "file"},
         }
-        yield result
 
+    def tombstones(self) -> list[dict[str, Any]]:
+        """
+        返回本次扫描中未出现的文件（即已删除的文件），并将其移出清单。
+        """
+        result: list[dict[str, Any]] = []
+        for key in [k for k in self.entries if k not in self.seen]:
+            entry: dict[str, Any] = self.entries.pop(key)
+            result.append({"file": key, **entry["info"]})
+        return result
 
-def main():
+
+def yield_info_incremental(
+    generator: Iterable[Path], manifest: Manifest, workers: int = 0
+) -> Generator[dict[str, Any], Any, None]:
     """
-    主函数。
+    增量版本的 yield_info。
+    文件大小和修改时间与清单一致时直接返回缓存信息，否则重新解析并更新清单。
+
+    Parameters:
+        generator (Iterable[Path]): 文件路径的可迭代对象。
+        manifest (Manifest): 文件清单缓存。
+        workers (int, optional): 大于 0 时使用 yield_info_parallel 解析变化的文件，默认为 0。
+
+    Yields:
+        dict (str, str | Path): 与 yield_info 相同。
     """
+    hits: list[dict[str, Any]] = []
+    stats: dict[str, os.stat_result] = {}
+
+    def changed() -> Generator[Path, Any, None]:
+        for file in generator:
+            key: str = str(file.absolute().relative_to(Path(__file__).parent))
+            stat: os.stat_result = file.stat()
+            cached: Optional[dict[str, Any]] = manifest.lookup(key=key, stat=stat)
+            if cached is not None:
+                hits.append({"file": Path(key), **cached})
+                continue
+            stats[key] = stat
+            yield file
+
+    infos: Generator[dict[str, Any], Any, None] = (
+        yield_info_parallel(generator=changed(), workers=workers)
+        if workers > 0
+        else yield_info(generator=changed())
+    )
+    for info in infos:
+        yield from hits
+        hits.clear()
+        key: str = str(info["file"])
+        manifest.update(key=key, stat=stats.pop(key), info=info)
+        yield info
+    yield from hits
+
+
+def extract_metadata(
+    keys: list[str],
+    cache: Manifest,
+    root: Path = Path("."),
+    workers: int = 0,
+    chunk_size: int = 64,
+) -> dict[str, dict[str, Any]]:
+    """
+    读取多个图像的 EXIF/XMP 元数据，见 metadata.read_metadata。
+    结果按文件大小和修改时间缓存在 cache 中，未变化的文件不会重新读取。
 
-    path = Path("./images")
-    old_data_file: Path = Path("ir_database.json")
-    data_file: Path = Path("database.json")
-    suffix: list[str] = [".jpg", ".png"]
+    Parameters:
+        keys (list[str]): 相对于 root 的文件路径。
+        cache (Manifest): 元数据缓存。
+        root (Path, optional): 路径的根目录，默认为当前目录。
+        workers (int, optional): 大于 0 时使用进程池读取，默认为 0。
+        chunk_size (int, optional): 每个任务包含的文件数，默认为 64。
+
+    Returns:
+        dict[str, dict[str, Any]]: 路径到元数据的映射，无法访问的文件不包含在内。
+    """
 
-    generator: Generator[Path, Any, None] = yield_file(path=path, suffix=suffix)
+    def stat(key: str) -> Optional[os.stat_result]:
+        try:
+            return os.stat(root / key)
+        except OSError:
+            return None
 
-    # 获取数据集对
-    pair_dict: dict[str, Pair] = {}
-    for i in yield_info(generator=generator):
-        time_stamp: str = i["time_stamp"]
-        if not time_stamp:
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        stats: list[Optional[os.stat_result]] = list(executor.map(stat, keys))
+
+    result: dict[str, dict[str, Any]] = {}
+    misses: list[tuple[str, os.stat_result]] = []
+    for key, file_stat in zip(keys, stats):
+        if file_stat is None:
             continue
-        if time_stamp not in pair_dict:
-            pair_dict[time_stamp] = Pair()
-            pair_dict[time_stamp].data.time_stamp = time_stamp
+        cached: Optional[dict[str, Any]] = cache.lookup(key=key, stat=file_stat)
+        if cached is None:
+            misses.append((key, file_stat))
+        else:
+            result[key] = cached
 
-        pair: Pair = pair_dict[time_stamp]
+    chunks: list[list[Path]] = [
+        [root / key for key, _ in misses[i : i + chunk_size]]
+        for i in range(0, len(misses), chunk_size)
+    ]
+    values: list[dict[str, Any]]
+    if workers > 0 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            values = [
+                value
+                for chunk in pool.map(read_metadata_chunk, chunks)
+                for value in chunk
+            ]
+    else:
+        values = [value for chunk in chunks for value in read_metadata_chunk(chunk)]
 
-        if i["img_type"] == "IR":
-            pair.processed = i["file"]
-        else:
-            pair.original = i["file"]
+    for (key, file_stat), value in zip(misses, values):
+        cache.update(key=key, stat=file_stat, info=value)
+        result[key] = value
+    return result
 
-        if i["weather"]:
-            pair.data.weather = i["weather"]
 
-        if i["temperature"]:
-            pair.data.temperature = i["temperature"]
+SEQUENCE_PATTERN: re.Pattern[str] = re.compile(r"^DJI_\d+_(\d+)_")
+"DJI 文件名中的拍摄序号，同一次拍摄的可见光和红外图像序号相同"
 
-        print(pair)
 
-    # 验证数据集是否成对
-    pd_copy = pair_dict.copy()
-    for pair in pd_copy.values():
-        if not pair.original or not pair.processed:
-            del pair_dict[pair.data.time_stamp]
+def _seconds(time_stamp: str) -> Optional[int]:
+    """
+    将 "YYYY-MM-DD HH:MM:SS" 转换为秒数，用于比较时间差，格式错误时返回 None。
+    """
+    try:
+        t: datetime = datetime.fromisoformat(time_stamp)
+    except ValueError:
+        return None
+    return t.toordinal() * 86400 + t.hour * 3600 + t.minute * 60 + t.second
+
+
+def _apply_frame(pair: Pair, info: dict[str, Any]) -> None:
+    if info["img_type"] == "IR":
+        pair.processed = info["file"]
+    else:
+        pair.original = info["file"]
+    if info["weather"]:
+        pair.data.weather = info["weather"]
+    if info["temperature"]:
+        pair.data.temperature = info["temperature"]
+
+
+def _sequence(info: dict[str, Any]) -> Optional[int]:
+    match: Optional[re.Match[str]] = SEQUENCE_PATTERN.match(Path(info["file"]).name)
+    return int(match[1]) if match is not None else None
+
+
+def pair_frames(
+    infos: Iterable[dict[str, Any]], tolerance: int = 1
+) -> tuple[dict[str, Pair], list[dict[str, Any]]]:
+    """
+    将可见光和红外图像配对。
+    两类图像分别按时间排序，对每张可见光图像用二分查找找出 tolerance 秒内的全部红外图像作为候选，
+    候选按（DJI 拍摄序号是否相同，时间差）从小到大依次配对，每张图像只配对一次。
+    不单独进行精确配对：间隔拍摄时可见光和红外图像的时间戳整体相差 1 秒，
+    按序号配对可以避免与相邻的另一次拍摄配对。
+
+    Parameters:
+        infos (Iterable[dict[str, Any]]): yield_info 返回的图像信息。
+        tolerance (int, optional): 允许的最大时间差（秒），默认为 1，0 表示只精确配对。
+
+    Returns:
+        tuple[dict[str, Pair], list[dict[str, Any]]]:
+            按可见光图像路径排序的数据集对，以及未配对的图像信息。
+            数据集对以可见光图像时间戳为键，同一时间戳的第二对及之后的数据集对以可见光图像路径为键。
+            没有时间戳、配对时落选（例如同一时间戳的 _V 和 _S 图像）或没有候选的图像都是未配对的图像。
+    """
+    unmatched: list[dict[str, Any]] = []
+    visible: list[tuple[int, str, dict[str, Any]]] = []
+    infrared: list[tuple[int, str, dict[str, Any]]] = []
+    for info in infos:
+        seconds: Optional[int] = (
+            _seconds(info["time_stamp"]) if info["time_stamp"] else None
+        )
+        if seconds is None:
+            unmatched.append(info)
             continue
-        if not pair.original.is_file() or not pair.processed.is_file():
-            del pair_dict[pair.data.time_stamp]
+        frames: list[tuple[int, str, dict[str, Any]]] = (
+            infrared if info["img_type"] == "IR" else visible
+        )
+        frames.append((seconds, str(info["file"]), info))
+    visible.sort(key=lambda item: item[:2])
+    infrared.sort(key=lambda item: item[:2])
+
+    # (序号是否不同, 时间差, 可见光图像下标, 红外图像下标)
+    tolerance = max(tolerance, 0)
+    t_seconds: list[int] = [seconds for seconds, _, _ in infrared]
+    t_sequences: list[Optional[int]] = [_sequence(info) for _, _, info in infrared]
+    candidates: list[tuple[int, int, int, int]] = []
+    for i, (seconds, _, info) in enumerate(visible):
+        sequence: Optional[int] = _sequence(info)
+        for j in range(
+            bisect_left(t_seconds, seconds - tolerance),
+            bisect_right(t_seconds, seconds + tolerance),
+        ):
+            candidates.append(
+                (
+                    int(sequence is None or sequence != t_sequences[j]),
+                    abs(t_seconds[j] - seconds),
+                    i,
+                    j,
+                )
+            )
+    candidates.sort()
+
+    pair_dict: dict[str, Pair] = {}
+    used_v: list[bool] = [False] * len(visible)
+    used_t: list[bool] = [False] * len(infrared)
+    for _, _, i, j in candidates:
+        if used_v[i] or used_t[j]:
             continue
-        if not pair.original.exists() or not pair.processed.exists():
-            del pair_dict[pair.data.time_stamp]
+        used_v[i] = used_t[j] = True
+        v: dict[str, Any] = visible[i][2]
+        pair: Pair = Pair()
+        pair.data.time_stamp = v["time_stamp"]
+        _apply_frame(pair=pair, info=v)
+        _apply_frame(pair=pair, info=infrared[j][2])
+        key: str = (
+            v["time_stamp"] if v["time_stamp"] not in pair_dict else visible[i][1]
+        )
+        pair_dict[key] = pair
+    for used, frames in ((used_v, visible), (used_t, infrared)):
+        unmatched.extend(info for done, (_, _, info) in zip(used, frames) if not done)
+
+    # 按可见光图像的路径排序，新记录的 id 在每个文件夹（一次飞行）内按拍摄时间连续，
+    # 且与遍历目录的顺序无关
+    pair_dict = dict(sorted(pair_dict.items(), key=lambda item: str(item[1].original)))
+    return (pair_dict, unmatched)
+
+
+def validate_pairs(
+    pair_dict: dict[str, Pair],
+    suffix: list[str],
+    seen: Optional[set[str]] = None,
+    workers: int = 16,
+) -> dict[str, Pair]:
+    """
+    去掉路径无效的数据集对。
+    先检查路径和后缀；已在 seen 中（遍历目录时已确认是普通文件）的路径不再访问文件系统，
+    其余路径在线程池中并发调用一次 os.path.isfile。
+
+    Parameters:
+        pair_dict (dict[str, Pair]): 以时间戳为键的数据集对。
+        suffix (list[str]): 允许的后缀。
+        seen (set[str], optional): 遍历目录时找到的文件的绝对路径，由 yield_file 或 yield_file_parallel 收集。
+        workers (int, optional): 检查剩余路径的线程数，默认为 16。
+
+    Returns:
+        dict[str, Pair]: 有效的数据集对，顺序与 pair_dict 相同。
+    """
+    root: Path = Path(__file__).parent
+    seen = seen or set()
+    invalid: tuple[Path, ...] = (Path("."), Path(".\\not_file"))
+    candidates: dict[str, tuple[str, str]] = {}
+    for key, pair in pair_dict.items():
+        original: Path = pair.original
+        processed: Path = pair.processed
+        if original in invalid or processed in invalid:
             continue
         if (
-            pair.original.suffix.lower() not in suffix
-            or pair.processed.suffix.lower() not in suffix
+            original.suffix.lower() not in suffix
+            or processed.suffix.lower() not in suffix
         ):
-            del pair_dict[pair.data.time_stamp]
             continue
-        if pair.original == Path(".") or pair.processed == Path("."):
-            del pair_dict[pair.data.time_stamp]
+        candidates[key] = (str(root / original), str(root / processed))
+
+    unknown: list[str] = list(
+        {path for paths in candidates.values() for path in paths if path not in seen}
+    )
+    is_file: dict[str, bool] = {}
+    if unknown:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            is_file = dict(zip(unknown, executor.map(os.path.isfile, unknown)))
+
+    return {
+        key: pair_dict[key]
+        for key, paths in candidates.items()
+        if all(path in seen or is_file[path] for path in paths)
+    }
+
+
+LEGACY_FIELDS: tuple[tuple[str, str, type, Any], ...] = (
+    ("temperature", "temp", int, ""),
+    ("wind_scale", "wind_scale", int, 0),
+    ("wind_speed", "wind_speed", int, 0),
+    ("humidity", "humidity", int, 0),
+    ("precip", "precip", float, 0.0),
+    ("pressure", "pressure", int, 0),
+    ("vis", "vis", int, 0),
+    ("cloud", "cloud", int, 0),
+    ("AS", "AS", float, 0.0),
+    ("HS", "HS", float, 0.0),
+)
+"旧数据集中需要转换类型的字段：(PicData 属性, 旧字段名, 类型, 缺省值)"
+
+
+def merge_legacy_records(
+    pair_dict: dict[str, Pair], legacy_file: Path, chunk_size: int = 1 << 20
+) -> dict[str, int]:
+    """
+    将旧数据集中的气象数据和拍摄位置合并到 pair_dict 中。
+    旧数据集以流的方式读取，内存占用与文件大小无关；
+    每条记录先用 create_time 在 pair_dict 中查找，只有匹配的记录才转换字段。
+
+    Parameters:
+        pair_dict (dict[str, Pair]): 以时间戳为键的数据集对。
+        legacy_file (Path): 旧数据集文件，不存在时跳过。
+        chunk_size (int, optional): 每次读取的字符数，默认为 1M。
+
+    Returns:
+        dict[str, int]: 读取、匹配、未匹配、无效（字段无法转换）的记录数。
+    """
+    stats: dict[str, int] = {"read": 0, "matched": 0, "unmatched": 0, "invalid": 0}
+    if not legacy_file.is_file():
+        print(f"旧数据集{legacy_file}不存在，跳过合并。")
+        return stats
+
+    start: float = time.perf_counter()
+    for record in iter_json_array(data_file=legacy_file, chunk_size=chunk_size):
+        stats["read"] += 1
+        time_stamp: str = record.get("create_time") or ""
+        pair: Optional[Pair] = pair_dict.get(time_stamp.partition(".")[0])
+        if pair is None or not time_stamp:
+            stats["unmatched"] += 1
             continue
-        if pair.original == Path(".\\not_file") or pair.processed == Path(
-            ".\\not_file"
-        ):
-            del pair_dict[pair.data.time_stamp]
+        try:
+            shoot_latlng: list[str] = json.loads(
+                record.get("shoot_latlng", '["0.0","0.0"]')
+            )
+            values: list[Any] = [
+                convert(record.get(key, default))
+                for _, key, convert, default in LEGACY_FIELDS
+            ]
+            position: tuple[float, float] = (
+                float(shoot_latlng[0]),
+                float(shoot_latlng[1]),
+            )
+        except (ValueError, TypeError, IndexError):
+            stats["invalid"] += 1
             continue
+        data: PicData = pair.data
+        data.shooting_position = position
+        data.wind_dir = record.get("wind_dir", "")
+        for (name, _, _, _), value in zip(LEGACY_FIELDS, values):
+            setattr(data, name, value)
+        stats["matched"] += 1
+
+    elapsed: float = time.perf_counter() - start
+    print(
+        f"合并旧数据集：读取{stats['read']}条，匹配{stats['matched']}条，"
+        f"未匹配{stats['unmatched']}条，无效{stats['invalid']}条，"
+        f"耗时{elapsed:.2f}秒，{stats['read'] / elapsed if elapsed else 0:.0f}条/秒。"
+    )
+    return stats
+
+
+SITE_POSITIONS: dict[str, tuple[float, float]] = {
+    "长大": (113.271431, 23.135336),
+    "厦大": (118.317851, 24.609725),
+}
+"路径中包含指定关键字的图像的拍摄位置 (经度, 纬度)"
+
+
+def main(
+    incremental: bool = False,
+    workers: int = 0,
+    tolerance: int = 1,
+    fingerprints: bool = True,
+    metadata: bool = True,
+) -> tuple[Optional[FingerprintStore], Optional[Manifest]]:
+    """
+    主函数。
+
+    Parameters:
+        incremental (bool, optional): 是否使用增量扫描，默认为 False。
+            增量扫描只重新解析新增或变化的文件，已删除的文件以 TOMBSTONES 输出。
+        workers (int, optional): 大于 0 时使用并行扫描和解析，默认为 0。
+        tolerance (int, optional): 可见光和红外图像配对时允许的最大时间差（秒），默认为 1。
+            未配对的图像以 UNMATCHED 输出。
+        fingerprints (bool, optional): 是否按内容指纹去除重复图像，默认为 True。
+            被去除的图像以 DUPLICATES 输出，内容发生变化的文件以 CHANGED 输出。
+        metadata (bool, optional): 是否读取图像的 EXIF/XMP 元数据填充拍摄位置，默认为 True。
+
+    Returns:
+        tuple[FingerprintStore | None, Manifest | None]: 指纹缓存和增量扫描的文件清单，
+            都需要在数据库生成或合并成功后再调用 save，否则合并失败时 TOMBSTONES 会丢失。
+    """
+
+    path = Path("./images")
+    old_data_file: Path = Path("ir_database.json")
+    data_file: Path = Path("database.json")
+    manifest_file: Path = Path("manifest.json")
+    metadata_file: Path = Path("metadata.json")
+    database_file: Path = Path("database.db")
+    suffix: list[str] = [".jpg", ".png"]
+
+    seen: set[str] = set()
+    generator: Generator[Path, Any, None] = (
+        yield_file_parallel(path=path, suffix=suffix, workers=workers, seen=seen)
+        if workers > 0
+        else yield_file(path=path, suffix=suffix, seen=seen)
+    )
+
+    manifest: Optional[Manifest] = None
+    infos: Iterable[dict[str, Any]]
+    if incremental:
+        manifest = Manifest(manifest_file=manifest_file)
+        manifest.load()
+        infos = yield_info_incremental(
+            generator=generator, manifest=manifest, workers=workers
+        )
+    elif workers > 0:
+        infos = yield_info_parallel(generator=generator, workers=workers)
+    else:
+        infos = yield_info(generator=generator)
+
+    # 去除重复图像
+    store: Optional[FingerprintStore] = None
+    duplicates: list[dict[str, str]] = []
+    if fingerprints:
+        store = FingerprintStore(
+            database_file=database_file, root=Path(__file__).parent
+        )
+        store.load()
+        infos, duplicates = dedup_frames(infos=infos, store=store)
+        print(
+            f"指纹：命中{store.hits}个，重新计算{store.misses}个，"
+            f"内容变化{len(store.changed)}个，重复{len(duplicates)}个。"
+        )
+
+    # 获取数据集对
+    pair_dict: dict[str, Pair]
+    unmatched: list[dict[str, Any]]
+    pair_dict, unmatched = pair_frames(infos=infos, tolerance=tolerance)
+    print(f"配对{len(pair_dict)}对，未配对{len(unmatched)}张。")
+
+    # 验证数据集是否成对
+    pair_dict = validate_pairs(pair_dict=pair_dict, suffix=suffix, seen=seen)
 
     print(f"共找到{len(pair_dict)}对数据。")
 
+    # 检测已删除的文件
+    tombstones: list[dict[str, Any]] = []
+    if manifest is not None:
+        tombstones = manifest.tombstones()
+        print(
+            f"增量扫描：命中{manifest.hits}个，重新解析{manifest.misses}个，"
+            f"删除{len(tombstones)}个。"
+        )
+
     # 继承旧数据集
-    with open(file=old_data_file, mode="r", encoding="utf-8") as f:
-        old_data: dict[str, Any] = json.load(f)
-        records: list[dict[str, Any]] = old_data.get("RECORDS", [])
-        for record in records:
-            _time_stamp: str = record.get("create_time", "")
-            if not _time_stamp:
-                continue
-            time_stamp: str = _time_stamp.split(".")[0]
-            if time_stamp in pair_dict:
-                pair: Pair = pair_dict[time_stamp]
-                _shoot_lating = record.get("shoot_latlng", '["0.0","0.0"]')
-                shoot_lating: list[str] = json.loads(_shoot_lating)
-                pair.data.shooting_position = (
-                    float(shoot_lating[0]),
-                    float(shoot_lating[1]),
-                )
-                temp: str = record.get("temp", "")
-                pair.data.temperature = int(temp)
-                pair.data.wind_dir = record.get("wind_dir", "")
-                pair.data.wind_scale = int(record.get("wind_scale", 0))
-                pair.data.wind_speed = int(record.get("wind_speed", 0))
-                pair.data.humidity = int(record.get("humidity", 0))
-                pair.data.precip = float(record.get("precip", 0.0))
-                pair.data.pressure = int(record.get("pressure", 0))
-                pair.data.vis = int(record.get("vis", 0))
-                pair.data.cloud = int(record.get("cloud", 0))
-                pair.data.AS = float(record.get("AS", 0.0))
-                pair.data.HS = float(record.get("HS", 0.0))
+    merge_legacy_records(pair_dict=pair_dict, legacy_file=old_data_file)
 
     # 对部分数据集进行信息补充
     for pair in pair_dict.values():
-        if "长大" in str(pair.original.absolute()):
-            pair.data.shooting_position = (113.271431, 23.135336)
-        elif "厦大" in str(pair.original.absolute()):
-            pair.data.shooting_position = (118.317851, 24.609725)
+        original: str = str(pair.original.absolute())
+        for site, position in SITE_POSITIONS.items():
+            if site in original:
+                pair.data.shooting_position = position
+                break
+
+    # 读取图像元数据，GPS 位置优先于旧数据集和 SITE_POSITIONS
+    if metadata:
+        cache: Manifest = Manifest(manifest_file=metadata_file)
+        cache.load()
+        located: int = 0
+        pending: list[Pair] = list(pair_dict.values())
+        for side in ("original", "processed"):
+            found: dict[str, dict[str, Any]] = extract_metadata(
+                keys=[str(getattr(pair, side)) for pair in pending],
+                cache=cache,
+                root=Path(__file__).parent,
+                workers=workers,
+            )
+            rest: list[Pair] = []
+            for pair in pending:
+                info: dict[str, Any] = found.get(str(getattr(pair, side)), {})
+                position: tuple[float, float] = (
+                    info.get("longitude", 0.0),
+                    info.get("latitude", 0.0),
+                )
+                if position == (0.0, 0.0):
+                    rest.append(pair)
+                    continue
+                pair.data.shooting_position = position
+                located += 1
+            pending = rest
+        cache.tombstones()
+        cache.save()
+        print(
+            f"元数据：命中{cache.hits}个，重新读取{cache.misses}个，"
+            f"{located}对包含 GPS 位置。"
+        )
 
     # 保存数据集
     data = {}
     data["RECORDS"] = [pair.dump() for pair in pair_dict.values()]
+    if manifest is not None:
+        data["TOMBSTONES"] = tombstones
+    if unmatched:
+        data["UNMATCHED"] = [
+            {
+                "file": str(info["file"]),
+                "time_stamp": info["time_stamp"],
+                "img_type": info["img_type"],
+            }
+            for info in unmatched
+        ]
+    if duplicates:
+        data["DUPLICATES"] = duplicates
+    if store is not None and store.changed:
+        data["CHANGED"] = store.changed
     with open(file=data_file, mode="w", encoding="utf-8") as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
+    return (store, manifest)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="扫描图像并生成数据集")
+    parser.add_argument(
+        "--incremental", action="store_true", help="增量扫描，只解析新增或变化的文件"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="并行扫描和解析的线程/进程数，0 表示不并行",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="删除并重建数据库，默认在数据库已存在时合并以保留标注结果",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=int,
+        default=1,
+        help="可见光和红外图像配对时允许的最大时间差（秒），0 表示只按时间戳精确配对",
+    )
+    parser.add_argument(
+        "--no-fingerprint",
+        action="store_true",
+        help="不计算文件指纹，不去除重复图像",
+    )
+    parser.add_argument(
+        "--no-metadata",
+        action="store_true",
+        help="不读取图像的 EXIF/XMP 元数据",
+    )
+    args = parser.parse_args()
+    _store: Optional[FingerprintStore]
+    _manifest: Optional[Manifest]
+    _store, _manifest = main(
+        incremental=args.incremental,
+        workers=args.workers,
+        tolerance=args.tolerance,
+        fingerprints=not args.no_fingerprint,
+        metadata=not args.no_metadata,
+    )
     _data_file: Path = Path("./database.json")
     _database_file: Path = Path("./database.db")
-    convert_to_sqlite(data_file=_data_file, database_file=_database_file)
+    # database 依赖本模块，只在运行时导入
+    from database import Database
+
+    _db: Database = Database(database_file=_database_file)
+    if _database_file.exists() and not args.rebuild:
+        # 先建立索引和聚合表的触发器，使合并时增量更新统计结果
+        _db.migrate()
+        merge_to_sqlite(data_file=_data_file, database_file=_database_file)
+    else:
+        convert_to_sqlite(data_file=_data_file, database_file=_database_file)
+        _db.migrate()
+    _db.close()
+    # 数据库写入成功后再保存，合并失败时下次增量扫描仍会输出已删除的文件
+    if _manifest is not None:
+        _manifest.save()
+    if _store is not None:
+        _store.save()
     print("Done!")
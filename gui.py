@@ -2,31 +2,84 @@
 gui.py
 """
 
+import argparse
+import atexit
 import json
-import sqlite3
+import signal
+import sys
+import time
 from pathlib import Path
-from typing import List, Literal, Tuple, cast
+from typing import List, Literal, Optional, Tuple, cast
 
 import gradio as gr
 
+from database import (
+    STATUS_ANNOTATED,
+    AnnotationWriter,
+    Database,
+    PairRepository,
+    RecordFilter,
+)
 from get_file import Pair, PicData
+from prefetch import Prefetcher
+from preview import PreviewCache
+from stats import condition_stats, site_name, site_stats
 
 DATA_FILE = Path("./database.db")
 
+db = Database(database_file=DATA_FILE)
+
+writer = AnnotationWriter(db=db)
+
+SEARCH_LIMIT = 1000
+"筛选结果最多显示的记录数"
+
+previews = PreviewCache()
+
+multi_user = False
+"多人标注模式，由命令行参数 --multi-user 开启"
+
+
+class Session:
+    """
+    多人标注模式下每个浏览器会话的状态，保存在 gr.State 中，各会话之间互不影响
+    """
+
+    def __init__(self, annotator: str) -> None:
+        self.annotator: str = annotator
+        "标注员名称"
+
+        self.id_range: Optional[Tuple[int, int]] = None
+        "分配到的 id 范围（闭区间）"
+
+        self.versions: dict[int, int] = {}
+        "显示过的记录的 id 到显示时行版本的映射，提交时据此检测冲突"
+
+
+def check_feature(feature: List[str]) -> None:
+    """
+    校验输入的地物类型，存在未知的地物类型时提示错误
+    """
+    try:
+        PicData.feature_to_mask(feature)
+    except ValueError as e:
+        raise gr.Error(str(e)) from e
+
+
+def image_path(path: Path, full_resolution: bool = False) -> str:
+    """
+    返回用于显示的图像路径，默认使用缩略图
+    """
+    if full_resolution:
+        return str(path)
+    return str(previews.get(path))
+
 
 def load_data() -> List[Tuple]:
     """
     加载数据库中的记录
     """
-    try:
-        conn = sqlite3.connect(DATA_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM records")
-        _records = cursor.fetchall()
-        conn.close()
-    except Exception as e:
-        raise LookupError("未能接入到 SQL") from e
-    return _records
+    return db.load_all()
 
 
 def to_pair(_records) -> List[Pair]:
@@ -56,11 +109,32 @@ def submit(
     wind_dir: str,
     wind_scale: int,
     wind_speed: int,
+    session: Optional[Session] = None,
 ) -> str:
     """
-    处理提交按钮的事件
+    处理提交按钮的事件。
+    多人标注模式下续租分配到的范围，从数据库读取最新的记录并立即写入，
+    图像不在分配到的范围内、范围已分配给其他标注员或记录在显示之后被其他标注员修改过时拒绝提交，
+    不修改共享的 Pair 对象
     """
-    pair: Pair = pairs[pair_idx]
+    check_feature(feature)
+    if session is not None:
+        if session.id_range is not None and not db.renew_claim(
+            session.annotator, session.id_range
+        ):
+            session.id_range = None
+            raise gr.Error("任务范围已超时并分配给其他标注员，请重新领取任务")
+        pair_id = pairs[pair_idx].id
+        if session.id_range is None or not (
+            session.id_range[0] <= pair_id <= session.id_range[1]
+        ):
+            # 通过跳转或筛选可以浏览任意图像，但只能提交自己范围内的图像
+            raise gr.Error("这张图像不在你领取的任务范围内，请先领取任务或返回任务范围")
+        pair, version = db.load_pair(pair_id)
+    elif multi_user:
+        raise gr.Error("请先填写标注员名称并领取任务")
+    else:
+        pair = pairs[pair_idx]
     pair.data.weather = weather
     pair.data.feature = cast(
         List[
@@ -75,7 +149,7 @@ def submit(
                 "beach",
             ]
         ],
-        feature,
+        [*feature, *pair.data.feature_raw],
     )
     pair.data.shooting_position = (shooting_position_x, shooting_position_y)
     pair.data.temperature = temperature
@@ -88,57 +162,17 @@ def submit(
     pair.data.wind_scale = wind_scale
     pair.data.wind_speed = wind_speed
 
-    pair.data.dump()
-
-    conn: sqlite3.Connection = sqlite3.connect(database=DATA_FILE)
-    cursor: sqlite3.Cursor = conn.cursor()
-
-    cursor.execute(
-        """
-    UPDATE records SET
-        original=?,
-        processed=?,
-        time_stamp=?,
-        feature=?,
-        shooting_position=?,
-        wind_dir=?,
-        wind_scale=?,
-        wind_speed=?,
-        humidity=?,
-        precip=?,
-        pressure=?,
-        vis=?,
-        cloud=?,
-        `AS`=?,
-        `HS`=?,
-        weather=?,
-        temperature=?
-    WHERE original=?
-    """,
-        (
-            str(pair.original),
-            str(pair.processed),
-            pair.data.time_stamp,
-            json.dumps(pair.data.feature, ensure_ascii=False),
-            json.dumps(pair.data.shooting_position, ensure_ascii=False),
-            pair.data.wind_dir,
-            pair.data.wind_scale,
-            pair.data.wind_speed,
-            pair.data.humidity,
-            pair.data.precip,
-            pair.data.pressure,
-            pair.data.vis,
-            pair.data.cloud,
-            pair.data.AS,
-            pair.data.HS,
-            pair.data.weather,
-            pair.data.temperature,
-            str(pair.original),
-        ),
-    )
-    conn.commit()
-    conn.close()
-    return json.dumps(pairs[pair_idx].data.dump(), indent=4, ensure_ascii=False)
+    if session is None:
+        writer.submit(pair)
+    else:
+        new_version = db.update_pair_versioned(
+            pair, session.versions.get(pair.id, version)
+        )
+        if new_version is None:
+            raise gr.Error("这张图像已被其他标注员修改，请重新加载后再提交")
+        session.versions[pair.id] = new_version
+        pairs.cache.pop(pair_idx)
+    return json.dumps(pair.data.dump(), indent=4, ensure_ascii=False)
 
 
 def submit_and_next(
@@ -156,9 +190,10 @@ def submit_and_next(
     wind_dir: str,
     wind_scale: int,
     wind_speed: int,
+    session: Optional[Session] = None,
 ) -> tuple[int, str]:
     """
-    处理提交并加载下一张按钮的事件
+    处理提交并加载下一张按钮的事件，多人标注模式下加载分配到的范围中的下一张未标注图像
     """
     result = submit(
         pair_idx=pair_idx,
@@ -175,11 +210,234 @@ def submit_and_next(
         wind_dir=wind_dir,
         wind_scale=wind_scale,
         wind_speed=wind_speed,
+        session=session,
     )
+    if session is not None:
+        next_idx = next_in_session(pair_idx, session)
+        return (pair_idx if next_idx is None else next_idx, result)
     pair_idx = (pair_idx + 1) % len(pairs)
     return (pair_idx, result)
 
 
+def search(
+    weather: List[str],
+    feature: List[str],
+    any_feature: bool,
+    status: str,
+    temperature_min: Optional[float],
+    temperature_max: Optional[float],
+    humidity_min: Optional[float],
+    humidity_max: Optional[float],
+    time_start: str,
+    time_end: str,
+):
+    """
+    处理筛选按钮的事件
+    """
+    writer.flush()
+    record_filter = RecordFilter(
+        weather=weather or None,
+        temperature=(temperature_min, temperature_max),
+        humidity=(humidity_min, humidity_max),
+        time_range=(time_start or None, time_end or None),
+        features=feature or None,
+        any_feature=any_feature,
+        annotated={"已标注": True, "未标注": False}.get(status),
+    )
+    results = db.query(record_filter, limit=SEARCH_LIMIT)
+    count = db.count(record_filter)
+    summary = f"共 {count} 条记录"
+    if count > len(results):
+        summary += f"，显示前 {len(results)} 条"
+    return (
+        summary,
+        gr.update(
+            choices=[(original, pair_id) for pair_id, original in results],
+            value=None,
+        ),
+        record_filter,
+    )
+
+
+def batch_apply(
+    selection: str,
+    start: Optional[float],
+    end: Optional[float],
+    record_filter: Optional[RecordFilter],
+    fields: List[str],
+    weather: str,
+    feature: List[str],
+    shooting_position_x: float,
+    shooting_position_y: float,
+    temperature: int,
+    humidity: int,
+    precip: float,
+    pressure: int,
+    visibility: int,
+    cloud_cover: int,
+    wind_dir: str,
+    wind_scale: int,
+    wind_speed: int,
+    mark_annotated: bool = True,
+    progress=gr.Progress(),
+) -> str:
+    """
+    处理批量标注按钮的事件，将选中的字段写入选中的全部图像
+    """
+    if not fields:
+        return "请选择要修改的字段"
+    if "feature" in fields:
+        check_feature(feature)
+    if selection == "筛选结果":
+        if record_filter is None:
+            return "请先在“筛选”中进行筛选"
+        ids = db.ids(record_filter)
+    else:
+        ids = db.ids(start=int(start or 0), stop=None if end is None else int(end) + 1)
+    if not ids:
+        return "没有选中任何图像"
+    values = {
+        "weather": weather,
+        "feature": feature,
+        "shooting_position": (shooting_position_x, shooting_position_y),
+        "temperature": temperature,
+        "humidity": humidity,
+        "precip": precip,
+        "pressure": pressure,
+        "vis": visibility,
+        "cloud": cloud_cover,
+        "wind_dir": wind_dir,
+        "wind_scale": wind_scale,
+        "wind_speed": wind_speed,
+    }
+
+    # 先写入单张标注中尚未写入的修改，避免之后覆盖批量修改的结果
+    writer.flush()
+    begin = time.perf_counter()
+    progress(0, desc="批量标注")
+    for done in db.update_fields(
+        ids, {name: values[name] for name in fields}, annotated=mark_annotated
+    ):
+        progress(done / len(ids), desc=f"批量标注 {done}/{len(ids)}")
+    pairs.refresh()
+    return f"已更新 {len(ids)} 条记录，用时 {time.perf_counter() - begin:.2f} 秒"
+
+
+def load_stats():
+    """
+    处理统计标签页的刷新事件，只读取聚合表
+    """
+    writer.flush()
+    conn = db.connection()
+    conditions = []
+    for weather, mask, count in condition_stats(conn):
+        feature = PicData.mask_to_feature(mask)
+        conditions.append(
+            [
+                weather or "未设置",
+                "未设置" if feature is None else ", ".join(feature) or "无",
+                count,
+            ]
+        )
+    sites = [
+        [site_name(site), field, count, round(mean, 2), round(std, 2), low, high]
+        for site, field, count, mean, std, low, high in site_stats(conn)
+    ]
+    return (conditions, sites)
+
+
+def is_annotated(pair: Pair) -> bool:
+    """
+    判断 Pair 是否已标注，尚未写入数据库的提交也视为已标注
+    """
+    if writer.pending(pair.id) is not None:
+        return True
+    return db.annotation_status(pair.id)[0] == STATUS_ANNOTATED
+
+
+def annotation_summary(pair_idx: int, session: Optional[Session] = None) -> str:
+    """
+    返回当前图像的标注状态和整体进度，进度只读取聚合表，
+    后台写入线程中尚未写入的提交在写入后才计入
+    """
+    pair = pairs[pair_idx]
+    status, annotated_at = db.annotation_status(pair.id)
+    if writer.pending(pair.id) is not None:
+        text = "已标注（等待写入）"
+    elif status == STATUS_ANNOTATED:
+        text = f"已标注（{annotated_at}）" if annotated_at else "已标注"
+    else:
+        text = "未标注"
+    annotated, total = db.progress()
+    rate = annotated / total if total else 0.0
+    text += f"，进度 {annotated} / {total}（{rate:.1%}）"
+    if session is not None and session.id_range is not None:
+        text += f"，任务剩余 {db.remaining(session.id_range)} 张"
+    return text
+
+
+def next_in_session(pair_idx: int, session: Session) -> Optional[int]:
+    """
+    返回会话分配到的范围中下一张未标注图像的下标，没有任务时返回 None。
+    范围已完成或已超时并分配给其他标注员时领取新的范围，否则续租当前范围
+    """
+    pair_id = None
+    if session.id_range is not None and db.renew_claim(
+        session.annotator, session.id_range
+    ):
+        pair_id = db.next_unannotated(pairs[pair_idx].id, session.id_range)
+    if pair_id is None:
+        session.id_range = db.claim_range(session.annotator)
+        if session.id_range is None:
+            gr.Info("没有可以领取的任务")
+            return None
+        pair_id = db.next_unannotated(session.id_range[0] - 1, session.id_range)
+    return None if pair_id is None else pairs.index_of(pair_id, near=pair_idx)
+
+
+def claim_task(annotator: str, pair_idx: int, session: Optional[Session]):
+    """
+    处理领取任务按钮的事件，为标注员分配 id 范围并跳转到其中第一张未标注的图像
+    """
+    annotator = annotator.strip()
+    if not annotator:
+        raise gr.Error("请填写标注员名称")
+    if session is None or session.annotator != annotator:
+        session = Session(annotator)
+    session.id_range = None
+    next_idx = next_in_session(pair_idx, session)
+    task = (
+        "没有可以领取的任务"
+        if session.id_range is None
+        else f"{annotator}：id {session.id_range[0]} – {session.id_range[1]}"
+    )
+    return (session, gr.update() if next_idx is None else next_idx, task)
+
+
+def next_unannotated(pair_idx: int, session: Optional[Session] = None):
+    """
+    处理跳到下一张未标注按钮的事件，多人标注模式下只在分配到的范围中查找
+    """
+    if session is not None:
+        next_idx = next_in_session(pair_idx, session)
+        return gr.update() if next_idx is None else next_idx
+    writer.flush()
+    pair_id = db.next_unannotated(pairs[pair_idx].id)
+    if pair_id is None:
+        gr.Info("全部图像都已标注")
+        return gr.update()
+    return pairs.index_of(pair_id, near=pair_idx)
+
+
+def jump_to(pair_id: Optional[int]):
+    """
+    处理筛选结果的选择事件，跳转到对应的图像
+    """
+    if pair_id is None:
+        return gr.update()
+    return pairs.index_of(pair_id)
+
+
 def main() -> None:
     """
     主函数
@@ -190,6 +448,13 @@ def main() -> None:
 
         # GUI 设计
         with gr.Tab(label="单张"):
+            # 多人标注：领取任务
+            session = gr.State(value=None)
+            with gr.Row(visible=multi_user):
+                annotator = gr.Textbox(label="标注员")
+                claim_btn = gr.Button("领取任务")
+                task = gr.Markdown(value="")
+
             # 图像和数据展示
             with gr.Row():
                 image_original = gr.Image(type="filepath", label="原始图像")
@@ -270,63 +535,96 @@ def main() -> None:
                     step=1,
                 )
 
-                def update_images(index):
-                    print(pairs[index].original, pairs[index].processed)
-                    image_original.value = str(pairs[index].original)
-                    image_processed.value = str(pairs[index].processed)
-                    label_data.value = json.dumps(
-                        pairs[index].data.dump(), indent=4, ensure_ascii=False
-                    )
-                    if pairs[index].data.weather:
-                        weather.value = pairs[index].data.weather
-                    if pairs[index].data.feature:
-                        feature.value = pairs[index].data.feature
-                    if pairs[index].data.shooting_position[0] != 0.0:
-                        shooting_position_x.value = pairs[index].data.shooting_position[
-                            0
-                        ]
-                    if pairs[index].data.shooting_position[1] != 0.0:
-                        shooting_position_y.value = pairs[index].data.shooting_position[
-                            1
-                        ]
-                    if pairs[index].data.temperature:
-                        temperature.value = pairs[index].data.temperature
-                    if pairs[index].data.humidity != 0:
-                        humidity.value = pairs[index].data.humidity
-                    if pairs[index].data.precip != 0.0:
-                        precip.value = pairs[index].data.precip
-                    if pairs[index].data.pressure != 0:
-                        pressure.value = pairs[index].data.pressure
-                    if pairs[index].data.vis != 0:
-                        visibility.value = pairs[index].data.vis
-                    if pairs[index].data.cloud != 0:
-                        cloud_cover.value = pairs[index].data.cloud
-                    if pairs[index].data.wind_dir:
-                        wind_dir.value = pairs[index].data.wind_dir
-                    if pairs[index].data.wind_scale != 0:
-                        wind_scale.value = pairs[index].data.wind_scale
-                    if pairs[index].data.wind_speed != 0:
-                        wind_speed.value = pairs[index].data.wind_speed
+                full_resolution = gr.Checkbox(value=False, label="加载原图")
+                prefetch_stats = gr.Markdown(value="")
+                annotation_status = gr.Markdown(value="")
+
+                def update_images(index, load_full_resolution=False, session=None):
+                    prefetcher.notify(index)
+                    pair = pairs[index]
+                    if session is not None:
+                        # 多人标注时读取最新的记录，并记录其行版本用于提交时检测冲突
+                        pair, version = db.load_pair(pair.id)
+                        session.versions[pair.id] = version
+                    print(pair.original, pair.processed)
+                    # 已标注的图像显示保存的值，未标注的图像只显示已有的值，其余控件保留上一张的输入。
+                    # 控件的值通过返回值更新，不修改共享的组件对象，各会话互不影响
+                    data = pair.data
+                    annotated = is_annotated(pair)
+
+                    def show(value, has_value):
+                        return (
+                            gr.update(value=value)
+                            if annotated or has_value
+                            else gr.update()
+                        )
+
                     return (
-                        image_original.value,
-                        image_processed.value,
-                        label_data.value,
+                        image_path(pair.original, load_full_resolution),
+                        image_path(pair.processed, load_full_resolution),
+                        json.dumps(data.dump(), indent=4, ensure_ascii=False),
+                        str(prefetcher),
+                        annotation_summary(index, session),
+                        show(data.weather, data.weather),
+                        # 无法识别的地物类型不在选项中，只在 JSON 中显示，提交时保留
+                        show(
+                            data.mask_to_feature(data.feature_mask) or [], data.feature
+                        ),
+                        show(
+                            data.shooting_position[0],
+                            data.shooting_position[0] != 0.0,
+                        ),
+                        show(
+                            data.shooting_position[1],
+                            data.shooting_position[1] != 0.0,
+                        ),
+                        (
+                            show(data.temperature, data.temperature)
+                            if data.temperature is not None
+                            else gr.update()
+                        ),
+                        show(data.humidity, data.humidity != 0),
+                        show(data.precip, data.precip != 0.0),
+                        show(data.pressure, data.pressure != 0),
+                        show(data.vis, data.vis != 0),
+                        show(data.cloud, data.cloud != 0),
+                        show(data.wind_dir, data.wind_dir),
+                        show(data.wind_scale, data.wind_scale != 0),
+                        show(data.wind_speed, data.wind_speed != 0),
                     )
 
-                pair_idx.change(  # pylint: disable=no-member
-                    fn=update_images,
-                    inputs=pair_idx,
-                    outputs=[
-                        image_original,
-                        image_processed,
-                        label_data,
-                    ],
-                )
+                for trigger in (pair_idx, full_resolution):
+                    trigger.change(  # pylint: disable=no-member
+                        fn=update_images,
+                        inputs=[pair_idx, full_resolution, session],
+                        outputs=[
+                            image_original,
+                            image_processed,
+                            label_data,
+                            prefetch_stats,
+                            annotation_status,
+                            weather,
+                            feature,
+                            shooting_position_x,
+                            shooting_position_y,
+                            temperature,
+                            humidity,
+                            precip,
+                            pressure,
+                            visibility,
+                            cloud_cover,
+                            wind_dir,
+                            wind_scale,
+                            wind_speed,
+                        ],
+                    )
 
                 submit_btn = gr.Button("提交", variant="primary")
 
                 submit_and_next_btn = gr.Button("提交并加载下一张", variant="primary")
 
+                next_unannotated_btn = gr.Button("跳到下一张未标注")
+
             submit_btn.click(  # pylint: disable=no-member
                 fn=submit,
                 inputs=[
@@ -344,8 +642,13 @@ def main() -> None:
                     wind_dir,
                     wind_scale,
                     wind_speed,
+                    session,
                 ],
                 outputs=label_data,
+            ).then(
+                fn=annotation_summary,
+                inputs=[pair_idx, session],
+                outputs=annotation_status,
             )
 
             submit_and_next_btn.click(  # pylint: disable=no-member
@@ -365,14 +668,243 @@ def main() -> None:
                     wind_dir,
                     wind_scale,
                     wind_speed,
+                    session,
                 ],
                 outputs=[pair_idx, label_data],
             )
 
+            next_unannotated_btn.click(  # pylint: disable=no-member
+                fn=next_unannotated, inputs=[pair_idx, session], outputs=pair_idx
+            )
+
+            claim_btn.click(  # pylint: disable=no-member
+                fn=claim_task,
+                inputs=[annotator, pair_idx, session],
+                outputs=[session, pair_idx, task],
+            )
+
+        with gr.Tab(label="筛选"):
+            with gr.Row():
+                with gr.Column():
+                    search_weather = gr.CheckboxGroup(
+                        choices=db.distinct("weather"), label="天气"
+                    )
+                    search_feature = gr.CheckboxGroup(
+                        choices=PicData.FEATURE_TYPE, label="地物类型"
+                    )
+                    search_any_feature = gr.Checkbox(
+                        value=False, label="包含任意一种地物类型即可"
+                    )
+                    search_status = gr.Radio(
+                        value="全部", choices=["全部", "已标注", "未标注"], label="状态"
+                    )
+                with gr.Column():
+                    with gr.Row():
+                        search_temperature_min = gr.Number(label="最低温度 (°C)")
+                        search_temperature_max = gr.Number(label="最高温度 (°C)")
+                    with gr.Row():
+                        search_humidity_min = gr.Number(label="最低湿度 (%)")
+                        search_humidity_max = gr.Number(label="最高湿度 (%)")
+                    with gr.Row():
+                        search_time_start = gr.Textbox(
+                            label="开始时间", placeholder="2024-01-01 00:00:00"
+                        )
+                        search_time_end = gr.Textbox(
+                            label="结束时间", placeholder="2024-12-31"
+                        )
+
+            search_filter = gr.State(value=None)
+            search_btn = gr.Button("筛选", variant="primary")
+            search_summary = gr.Markdown(value="")
+            search_results = gr.Dropdown(
+                choices=[], label="筛选结果（选择后跳转到“单张”中对应的图像）"
+            )
+
+            search_btn.click(  # pylint: disable=no-member
+                fn=search,
+                inputs=[
+                    search_weather,
+                    search_feature,
+                    search_any_feature,
+                    search_status,
+                    search_temperature_min,
+                    search_temperature_max,
+                    search_humidity_min,
+                    search_humidity_max,
+                    search_time_start,
+                    search_time_end,
+                ],
+                outputs=[search_summary, search_results, search_filter],
+            )
+            search_results.change(  # pylint: disable=no-member
+                fn=jump_to, inputs=search_results, outputs=pair_idx
+            )
+
+        with gr.Tab(label="批量"):
+            with gr.Row():
+                batch_selection = gr.Radio(
+                    value="范围", choices=["范围", "筛选结果"], label="选择图像"
+                )
+                batch_start = gr.Number(value=0, precision=0, label="起始编号")
+                batch_end = gr.Number(
+                    value=len(pairs) - 1, precision=0, label="结束编号（包含）"
+                )
+            batch_fields = gr.CheckboxGroup(
+                choices=[
+                    ("天气", "weather"),
+                    ("地物类型", "feature"),
+                    ("拍摄位置", "shooting_position"),
+                    ("温度", "temperature"),
+                    ("湿度", "humidity"),
+                    ("降水量", "precip"),
+                    ("气压", "pressure"),
+                    ("能见度", "vis"),
+                    ("云量", "cloud"),
+                    ("风向", "wind_dir"),
+                    ("风力等级", "wind_scale"),
+                    ("风速", "wind_speed"),
+                ],
+                label="要修改的字段（未选中的字段保持不变）",
+            )
+            with gr.Row():
+                with gr.Column():
+                    batch_weather = gr.Dropdown(
+                        value="sunny",
+                        choices=[
+                            ("晴", "sunny"),
+                            ("阴", "overcast"),
+                            ("多云", "cloudy"),
+                            ("雨", "rainy"),
+                            ("雪", "snowy"),
+                            ("雾", "foggy"),
+                        ],
+                        label="天气",
+                    )
+                    batch_feature = gr.CheckboxGroup(
+                        choices=PicData.FEATURE_TYPE, label="地物类型"
+                    )
+                    batch_shooting_position_x = gr.Number(label="拍摄位置 (经度)")
+                    batch_shooting_position_y = gr.Number(label="拍摄位置 (纬度)")
+                with gr.Column():
+                    batch_temperature = gr.Slider(
+                        value=-50, minimum=-50, maximum=50, step=1, label="温度 (°C)"
+                    )
+                    batch_humidity = gr.Slider(
+                        value=0, minimum=0, maximum=100, step=1, label="湿度 (%)"
+                    )
+                    batch_precip = gr.Number(value=0.0, label="降水量 (mm)")
+                    batch_pressure = gr.Number(value=0, label="气压 (hPa)")
+                    batch_visibility = gr.Number(value=0, label="能见度 (m)")
+                    batch_cloud_cover = gr.Slider(
+                        value=0, minimum=0, maximum=100, step=1, label="云量 (%)"
+                    )
+                with gr.Column():
+                    batch_wind_dir = gr.Dropdown(
+                        value="北风",
+                        choices=[
+                            "北风",
+                            "东风",
+                            "南风",
+                            "西风",
+                            "东北风",
+                            "东南风",
+                            "西北风",
+                            "西南风",
+                        ],
+                        label="风向",
+                    )
+                    batch_wind_scale = gr.Slider(
+                        minimum=0, maximum=12, step=1, label="风力等级"
+                    )
+                    batch_wind_speed = gr.Slider(
+                        minimum=0, maximum=100, step=1, label="风速 (km/h)"
+                    )
+
+            batch_mark_annotated = gr.Checkbox(
+                value=True, label="同时标记为已标注（取消后不改变标注状态）"
+            )
+            batch_btn = gr.Button("应用到选中的图像", variant="primary")
+            batch_summary = gr.Markdown(value="")
+
+            batch_btn.click(  # pylint: disable=no-member
+                fn=batch_apply,
+                inputs=[
+                    batch_selection,
+                    batch_start,
+                    batch_end,
+                    search_filter,
+                    batch_fields,
+                    batch_weather,
+                    batch_feature,
+                    batch_shooting_position_x,
+                    batch_shooting_position_y,
+                    batch_temperature,
+                    batch_humidity,
+                    batch_precip,
+                    batch_pressure,
+                    batch_visibility,
+                    batch_cloud_cover,
+                    batch_wind_dir,
+                    batch_wind_scale,
+                    batch_wind_speed,
+                    batch_mark_annotated,
+                ],
+                outputs=batch_summary,
+            )
+
+        with gr.Tab(label="统计"):
+            stats_btn = gr.Button("刷新", variant="primary")
+            conditions, sites = load_stats()
+            stats_conditions = gr.Dataframe(
+                value=conditions,
+                headers=["天气", "地物类型", "数量"],
+                label="天气 × 地物类型",
+                interactive=False,
+            )
+            stats_sites = gr.Dataframe(
+                value=sites,
+                headers=[
+                    "拍摄地点",
+                    "字段",
+                    "数量",
+                    "平均值",
+                    "标准差",
+                    "最小值",
+                    "最大值",
+                ],
+                label="各拍摄地点的温度和湿度分布",
+                interactive=False,
+            )
+
+            stats_btn.click(  # pylint: disable=no-member
+                fn=load_stats, outputs=[stats_conditions, stats_sites]
+            )
+
     app.launch()
 
 
 if __name__ == "__main__":
-    records = load_data()
-    pairs: List[Pair] = to_pair(records)
+    parser = argparse.ArgumentParser(description="数据集标注工具")
+    parser.add_argument(
+        "--multi-user",
+        action="store_true",
+        help="多人标注模式：按会话分配任务范围，提交时检测冲突",
+    )
+    parser.add_argument(
+        "--pregenerate-previews",
+        action="store_true",
+        help="启动时在后台为全部图像生成缩略图",
+    )
+    args = parser.parse_args()
+    multi_user = args.multi_user
+
+    pairs: PairRepository = PairRepository(db=db, writer=writer)
+    prefetcher: Prefetcher = Prefetcher(pairs=pairs, previews=previews)
+    atexit.register(prefetcher.close)
+    writer.start()
+    atexit.register(writer.close)
+    if args.pregenerate_previews:
+        previews.pregenerate(db.iter_paths())
+        atexit.register(previews.close)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     main()
@@ -0,0 +1,184 @@
+"""
+metadata.py
+"""
+
+import mmap
+import os
+import re
+import struct
+from pathlib import Path
+from typing import Any, Optional
+
+_TYPE_SIZES: dict[int, int] = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+"TIFF 数据类型对应的字节数"
+
+_XMP_HEADER: bytes = b"http://ns.adobe.com/xap/1.0/\x00"
+
+_XMP_ATTRIBUTE: re.Pattern[bytes] = re.compile(
+    rb"drone-dji:(\w+)\s*=\s*\"([^\"]*)\"|<drone-dji:(\w+)>([^<]*)</drone-dji:"
+)
+
+XMP_FIELDS: dict[str, str] = {
+    "GpsLatitude": "latitude",
+    "GpsLongitude": "longitude",
+    "GpsLongtitude": "longitude",
+    "AbsoluteAltitude": "altitude",
+    "RelativeAltitude": "relative_altitude",
+    "GimbalPitchDegree": "gimbal_pitch",
+    "GimbalYawDegree": "gimbal_yaw",
+    "GimbalRollDegree": "gimbal_roll",
+    "FlightPitchDegree": "flight_pitch",
+    "FlightYawDegree": "flight_yaw",
+    "FlightRollDegree": "flight_roll",
+}
+"DJI XMP 字段到结果键的映射，部分固件将 Longitude 拼写为 Longtitude"
+
+
+class _Tiff:
+    """
+    EXIF 中 TIFF 结构的最小解析器，只读取需要的标签。
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.data: bytes = data
+        self.endian: str = "<" if data[:2] == b"II" else ">"
+
+    def unpack(self, fmt: str, offset: int) -> tuple:
+        return struct.unpack_from(self.endian + fmt, self.data, offset)
+
+    def ifd(self, offset: int) -> dict[int, Any]:
+        """
+        读取 offset 处的 IFD，返回标签到值的映射。
+        """
+        result: dict[int, Any] = {}
+        (count,) = self.unpack("H", offset)
+        for i in range(count):
+            entry: int = offset + 2 + i * 12
+            tag, kind, n = self.unpack("HHI", entry)
+            size: int = _TYPE_SIZES.get(kind, 0) * n
+            if not size:
+                continue
+            start: int = entry + 8 if size <= 4 else self.unpack("I", entry + 8)[0]
+            if start + size > len(self.data):
+                continue
+            result[tag] = self.value(kind, n, start)
+        return result
+
+    def value(self, kind: int, n: int, start: int) -> Any:
+        if kind == 2:
+            return (
+                self.data[start : start + n]
+                .split(b"\x00", 1)[0]
+                .decode("ascii", "replace")
+            )
+        if kind in (5, 10):
+            values: tuple = self.unpack(("I" if kind == 5 else "i") * 2 * n, start)
+            return [
+                values[i] / values[i + 1] if values[i + 1] else 0.0
+                for i in range(0, len(values), 2)
+            ]
+        fmt: str = {1: "B", 3: "H", 4: "I", 7: "B", 9: "i"}[kind]
+        return list(self.unpack(fmt * n, start))
+
+
+def _parse_exif(payload: bytes, result: dict[str, Any]) -> None:
+    tiff: _Tiff = _Tiff(payload)
+    ifd0: dict[int, Any] = tiff.ifd(tiff.unpack("I", 4)[0])
+    if 0x0110 in ifd0:
+        result["model"] = ifd0[0x0110]
+    if 0x8769 in ifd0:
+        exif: dict[int, Any] = tiff.ifd(ifd0[0x8769][0])
+        if 0x9003 in exif:
+            result["datetime_original"] = exif[0x9003]
+    if 0x8825 not in ifd0:
+        return
+    gps: dict[int, Any] = tiff.ifd(ifd0[0x8825][0])
+    for ref_tag, tag, key, negative in (
+        (1, 2, "latitude", "S"),
+        (3, 4, "longitude", "W"),
+    ):
+        if tag in gps and len(gps[tag]) == 3:
+            degrees, minutes, seconds = gps[tag]
+            value: float = degrees + minutes / 60 + seconds / 3600
+            result[key] = -value if gps.get(ref_tag) == negative else value
+    if 6 in gps:
+        altitude: float = gps[6][0]
+        result["altitude"] = -altitude if gps.get(5, [0])[0] == 1 else altitude
+
+
+def _parse_xmp(payload: bytes, result: dict[str, Any]) -> None:
+    for match in _XMP_ATTRIBUTE.finditer(payload):
+        name: bytes = match.group(1) or match.group(3)
+        value: bytes = match.group(2) if match.group(1) else match.group(4)
+        key: Optional[str] = XMP_FIELDS.get(name.decode("ascii"))
+        if key is None:
+            continue
+        try:
+            result[key] = float(value)
+        except ValueError:
+            continue
+
+
+def read_metadata(path: Path) -> dict[str, Any]:
+    """
+    读取 JPEG 文件的 EXIF 和 DJI XMP 元数据。
+    文件以 mmap 方式打开，只访问图像数据之前的 APP 段，不解码图像。
+    XMP 中的数值优先于 EXIF。
+
+    Parameters:
+        path (Path): 图像路径。
+
+    Returns:
+        dict[str, Any]: 可能包含以下键：
+            'longitude', 'latitude': 经纬度。
+            'altitude', 'relative_altitude': 海拔高度和相对起飞点的高度（米）。
+            'gimbal_pitch', 'gimbal_yaw', 'gimbal_roll': 云台角度。
+            'flight_pitch', 'flight_yaw', 'flight_roll': 飞行器姿态角度。
+            'datetime_original': 拍摄时间。
+            'model': 相机型号。
+        非 JPEG 文件或无法解析时返回空字典。
+    """
+    result: dict[str, Any] = {}
+    xmp: dict[str, Any] = {}
+    with open(file=path, mode="rb") as f:
+        if os.fstat(f.fileno()).st_size < 4:
+            return result
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:2] != b"\xff\xd8":
+                return result
+            pos: int = 2
+            while pos + 4 <= len(data):
+                if data[pos] != 0xFF:
+                    break
+                marker: int = data[pos + 1]
+                if marker == 0xFF:
+                    pos += 1
+                    continue
+                if marker in (0xD9, 0xDA):
+                    break
+                (length,) = struct.unpack_from(">H", data, pos + 2)
+                if marker == 0xE1:
+                    payload: bytes = data[pos + 4 : pos + 2 + length]
+                    try:
+                        if payload.startswith(b"Exif\x00\x00"):
+                            _parse_exif(payload[6:], result)
+                        elif payload.startswith(_XMP_HEADER):
+                            _parse_xmp(payload[len(_XMP_HEADER) :], xmp)
+                    except (struct.error, IndexError, KeyError, ValueError):
+                        pass
+                pos += 2 + length
+    result.update(xmp)
+    return result
+
+
+def read_metadata_chunk(paths: list[Path]) -> list[dict[str, Any]]:
+    """
+    依次读取多个文件的元数据，供进程池调用。无法访问的文件返回空字典。
+    """
+    result: list[dict[str, Any]] = []
+    for path in paths:
+        try:
+            result.append(read_metadata(path))
+        except OSError:
+            result.append({})
+    return result
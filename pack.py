@@ -0,0 +1,274 @@
+"""
+pack.py
+"""
+
+import argparse
+import io
+import json
+import os
+import sqlite3
+import tarfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from convert import SELECT_COLUMNS
+from get_file import Pair
+
+INDEX_FILE: str = "index.json"
+"分片目录中记录全部分片的文件"
+
+
+def sample_key(pair: Pair) -> str:
+    """
+    返回样本在分片中的键，即补零后的数据库 id。键中不包含“.”，与 WebDataset 的分组规则兼容。
+    """
+    return f"{pair.id:09d}"
+
+
+def _add_member(tar: tarfile.TarFile, name: str, data: bytes) -> tuple[int, int]:
+    info: tarfile.TarInfo = tarfile.TarInfo(name=name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+    padded: int = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+    return (tar.offset - padded, info.size)
+
+
+def write_shard(shard_file: Path, pairs: list[Pair], root: Path) -> int:
+    """
+    将 pairs 写入一个 tar 分片，并在同一目录下写入偏移量索引（shard_file 加上 .idx 后缀）。
+    每个样本包含 {key}.original{后缀}、{key}.processed{后缀} 和 {key}.json（Pair.dump() 的结果）。
+    索引每行一个样本：{"key": 键, "json": [偏移量, 大小], "original": [...], "processed": [...]}。
+
+    Parameters:
+        shard_file (Path): 分片文件。
+        pairs (list[Pair]): 样本。
+        root (Path): 图像路径的根目录。
+
+    Returns:
+        int: 写入的样本数，无法读取的图像对应的样本会被跳过。
+    """
+    tmp_file: Path = shard_file.with_name(f"{shard_file.name}.tmp")
+    entries: list[dict[str, Any]] = []
+    with tarfile.open(name=tmp_file, mode="w", format=tarfile.USTAR_FORMAT) as tar:
+        for pair in pairs:
+            key: str = sample_key(pair)
+            try:
+                original: bytes = (root / pair.original).read_bytes()
+                processed: bytes = (root / pair.processed).read_bytes()
+            except OSError:
+                continue
+            entry: dict[str, Any] = {"key": key}
+            entry["json"] = _add_member(
+                tar,
+                f"{key}.json",
+                json.dumps(pair.dump(), ensure_ascii=False).encode("utf-8"),
+            )
+            entry["original"] = _add_member(
+                tar, f"{key}.original{pair.original.suffix.lower()}", original
+            )
+            entry["processed"] = _add_member(
+                tar, f"{key}.processed{pair.processed.suffix.lower()}", processed
+            )
+            entries.append(entry)
+    index_file: Path = shard_file.with_name(f"{shard_file.name}.idx")
+    with open(file=index_file, mode="w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False))
+            f.write("\n")
+    os.replace(tmp_file, shard_file)
+    return len(entries)
+
+
+def write_shards(
+    database_file: Path,
+    output_dir: Path,
+    root: Path = Path("."),
+    shard_size: int = 1 << 30,
+    max_samples: Optional[int] = None,
+    workers: int = 4,
+    batch_size: int = 1000,
+) -> dict[str, int]:
+    """
+    将数据库中的全部 Pair 及其图像按 id 顺序打包为 WebDataset 格式的 tar 分片。
+    按图像大小划分分片，每个分片由线程池中的一个线程写入，多个分片并行写入。
+    目录中的 index.json 记录全部分片，每个分片另有偏移量索引，见 write_shard。
+
+    Parameters:
+        database_file (Path): SQLite 数据库文件。
+        output_dir (Path): 输出目录。
+        root (Path, optional): 图像路径的根目录，默认为当前目录。
+        shard_size (int, optional): 每个分片中图像的最大总字节数，默认为 1G。
+        max_samples (int, optional): 每个分片的最大样本数，默认不限制。
+        workers (int, optional): 并行写入的分片数，默认为 4。
+        batch_size (int, optional): 每次从数据库读取的记录数，默认为 1000。
+
+    Returns:
+        dict (str, int): 分片数、样本数、跳过的样本数和写入的字节数。
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    start: float = time.perf_counter()
+    shards: list[dict[str, Any]] = []
+    futures: deque[tuple[dict[str, Any], Future]] = deque()
+    stats: dict[str, int] = {"shards": 0, "samples": 0, "skipped": 0, "bytes": 0}
+
+    def size(pair: Pair) -> Optional[int]:
+        try:
+            return (root / pair.original).stat().st_size + (
+                root / pair.processed
+            ).stat().st_size
+        except OSError:
+            return None
+
+    def collect(wait_all: bool) -> None:
+        while futures and (wait_all or len(futures) >= workers * 2):
+            shard, future = futures.popleft()
+            shard["samples"] = future.result()
+            stats["samples"] += shard["samples"]
+
+    def submit(pairs: list[Pair], total: int) -> None:
+        name: str = f"shard-{len(shards):06d}.tar"
+        shard: dict[str, Any] = {"file": name, "index": f"{name}.idx"}
+        shards.append(shard)
+        stats["bytes"] += total
+        futures.append(
+            (shard, writers.submit(write_shard, output_dir / name, pairs, root))
+        )
+        collect(wait_all=False)
+
+    conn: sqlite3.Connection = sqlite3.connect(database_file)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as stat_pool, ThreadPoolExecutor(
+            max_workers=workers
+        ) as writers:
+            cursor: sqlite3.Cursor = conn.execute(
+                f"SELECT id, {SELECT_COLUMNS} FROM records ORDER BY id"
+            )
+            current: list[Pair] = []
+            current_size: int = 0
+            while rows := cursor.fetchmany(batch_size):
+                pairs: list[Pair] = []
+                for row in rows:
+                    pair: Pair = Pair()
+                    pair.load_from_tuple(row)
+                    pairs.append(pair)
+                for pair, pair_size in zip(pairs, stat_pool.map(size, pairs)):
+                    if pair_size is None:
+                        stats["skipped"] += 1
+                        continue
+                    if current and (
+                        current_size + pair_size > shard_size
+                        or (max_samples is not None and len(current) >= max_samples)
+                    ):
+                        submit(current, current_size)
+                        current, current_size = [], 0
+                    current.append(pair)
+                    current_size += pair_size
+            if current:
+                submit(current, current_size)
+            collect(wait_all=True)
+    finally:
+        conn.close()
+
+    with open(file=output_dir / INDEX_FILE, mode="w", encoding="utf-8") as f:
+        json.dump({"shards": shards}, f, ensure_ascii=False, indent=4)
+    stats["shards"] = len(shards)
+    elapsed: float = time.perf_counter() - start
+    print(
+        f"写入{stats['shards']}个分片，{stats['samples']}个样本，"
+        f"跳过{stats['skipped']}个，共{stats['bytes'] / (1 << 20):.1f}MiB，"
+        f"用时{elapsed:.2f}秒。"
+    )
+    return stats
+
+
+class ShardReader:
+    """
+    按偏移量索引随机读取 write_shards 生成的分片，不需要解析 tar 文件。
+    使用 os.pread 读取，可以在多个线程中同时使用。
+    """
+
+    def __init__(self, shard_dir: Path) -> None:
+        self.shard_dir: Path = shard_dir
+        "分片目录"
+
+        self.entries: list[tuple[int, dict[str, Any]]] = []
+        "(分片序号, 索引条目)"
+
+        self.shards: list[str] = []
+        "分片文件名"
+
+        self._fds: dict[int, int] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+        with open(file=shard_dir / INDEX_FILE, mode="r", encoding="utf-8") as f:
+            shards: list[dict[str, Any]] = json.load(f)["shards"]
+        for number, shard in enumerate(shards):
+            self.shards.append(shard["file"])
+            with open(file=shard_dir / shard["index"], mode="r", encoding="utf-8") as f:
+                self.entries.extend((number, json.loads(line)) for line in f)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[tuple[dict[str, Any], bytes, bytes]]:
+        for index in range(len(self.entries)):
+            yield self[index]
+
+    def _read(self, shard: int, span: list[int]) -> bytes:
+        fd: Optional[int] = self._fds.get(shard)
+        if fd is None:
+            with self._lock:
+                fd = self._fds.get(shard)
+                if fd is None:
+                    fd = os.open(self.shard_dir / self.shards[shard], os.O_RDONLY)
+                    self._fds[shard] = fd
+        offset, size = span
+        return os.pread(fd, size, offset)
+
+    def __getitem__(self, index: int) -> tuple[dict[str, Any], bytes, bytes]:
+        """
+        返回第 index 个样本的 (Pair.dump() 的结果, 原始图像, 红外图像)。
+        """
+        shard, entry = self.entries[index]
+        return (
+            json.loads(self._read(shard, entry["json"])),
+            self._read(shard, entry["original"]),
+            self._read(shard, entry["processed"]),
+        )
+
+    def close(self) -> None:
+        """
+        关闭打开的分片文件。
+        """
+        with self._lock:
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将数据集打包为 tar 分片")
+    parser.add_argument("output_dir", type=Path, help="输出目录")
+    parser.add_argument(
+        "--database", type=Path, default=Path("./database.db"), help="数据库文件"
+    )
+    parser.add_argument(
+        "--shard-size", type=int, default=1024, help="每个分片的最大大小（MiB）"
+    )
+    parser.add_argument(
+        "--max-samples", type=int, default=None, help="每个分片的最大样本数"
+    )
+    parser.add_argument("--workers", type=int, default=4, help="并行写入的分片数")
+    args = parser.parse_args()
+    write_shards(
+        database_file=args.database,
+        output_dir=args.output_dir,
+        shard_size=args.shard_size << 20,
+        max_samples=args.max_samples,
+        workers=args.workers,
+    )
@@ -0,0 +1,102 @@
+"""
+prefetch.py
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence
+
+from cache import LRUCache
+from get_file import Pair
+from preview import PreviewCache
+
+
+class Prefetcher:
+    """
+    相邻图像对预取器。
+    每次切换到某个下标后，在后台线程中提前加载后 ahead 个和前 behind 个 Pair，
+    并生成它们的缩略图，使“提交并加载下一张”时不需要等待读取数据库和缩放图像。
+    """
+
+    def __init__(
+        self,
+        pairs: Sequence[Pair],
+        previews: Optional[PreviewCache] = None,
+        ahead: int = 4,
+        behind: int = 1,
+        workers: int = 2,
+        memory_size: int = 256,
+    ) -> None:
+        self.pairs: Sequence[Pair] = pairs
+        "Pair 序列，通常为 PairRepository"
+
+        self.previews: Optional[PreviewCache] = previews
+        "缩略图缓存，为 None 时只预取 Pair"
+
+        self.ahead: int = ahead
+        "向后预取的数量"
+
+        self.behind: int = behind
+        "向前预取的数量"
+
+        self.hits: int = 0
+        "请求的下标已预取完成的次数"
+
+        self.misses: int = 0
+        "请求的下标尚未预取的次数"
+
+        self._warmed: LRUCache[int, bool] = LRUCache(max_size=memory_size)
+        self._in_flight: set[int] = set()
+        self._lock: threading.Lock = threading.Lock()
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="Prefetcher"
+        )
+
+    def __str__(self) -> str:
+        total: int = self.hits + self.misses
+        rate: float = self.hits / total if total else 0.0
+        return f"预取命中 {self.hits}，未命中 {self.misses}，命中率 {rate:.0%}"
+
+    def warm(self, index: int) -> None:
+        """
+        加载下标为 index 的 Pair 并生成缩略图。
+        """
+        try:
+            pair: Pair = self.pairs[index]
+            if self.previews is not None:
+                self.previews.get(pair.original)
+                self.previews.get(pair.processed)
+            self._warmed.put(index, True)
+        finally:
+            with self._lock:
+                self._in_flight.discard(index)
+
+    def notify(self, index: int) -> None:
+        """
+        记录对 index 的访问并预取其相邻的 Pair，在显示 index 之前调用。
+        """
+        if index in self._warmed:
+            self.hits += 1
+        else:
+            self.misses += 1
+        count: int = len(self.pairs)
+        if not count:
+            return
+        neighbours: list[int] = [index + i for i in range(1, self.ahead + 1)]
+        neighbours += [index - i for i in range(1, self.behind + 1)]
+        for neighbour in neighbours:
+            neighbour %= count
+            with self._lock:
+                if neighbour in self._in_flight or neighbour in self._warmed:
+                    continue
+                self._in_flight.add(neighbour)
+            try:
+                self._executor.submit(self.warm, neighbour)
+            except RuntimeError:
+                return
+
+    def close(self) -> None:
+        """
+        停止预取。
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,182 @@
+"""
+preview.py
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Iterable, Optional
+
+from PIL import Image
+
+from cache import LRUCache
+
+
+def generate_preview(
+    source: Path, target: Path, max_size: tuple[int, int], fmt: str, quality: int
+) -> Path:
+    """
+    生成缩略图。JPEG 会在解码时直接降采样，不需要完整解码原图。
+
+    Parameters:
+        source (Path): 原图。
+        target (Path): 缩略图保存路径。
+        max_size (tuple[int, int]): 缩略图的最大宽高。
+        fmt (str): 缩略图格式，"JPEG" 或 "WEBP"。
+        quality (int): 压缩质量。
+
+    Returns:
+        Path: 缩略图路径。
+    """
+    with Image.open(source) as img:
+        img.draft("RGB", max_size)
+        img.thumbnail(max_size)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # 每次调用使用独立的临时文件，多个线程同时生成同一张缩略图时不会互相覆盖
+        fd, tmp_name = tempfile.mkstemp(
+            suffix=".tmp", prefix=f"{target.name}.", dir=target.parent
+        )
+        tmp_file: Path = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, format=fmt, quality=quality)
+            os.replace(tmp_file, target)
+        except BaseException:
+            tmp_file.unlink(missing_ok=True)
+            raise
+    return target
+
+
+class PreviewCache:
+    """
+    缩略图缓存。
+    缩略图以 (路径, 修改时间, 大小) 为键保存在磁盘上，原图变化后会自动重新生成；
+    最近使用的缩略图路径保存在内存中的 LRU 缓存里。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = Path("./.preview_cache"),
+        max_size: tuple[int, int] = (1280, 1280),
+        fmt: str = "JPEG",
+        quality: int = 85,
+        memory_size: int = 1024,
+    ) -> None:
+        self.cache_dir: Path = cache_dir
+        "缩略图目录"
+
+        self.max_size: tuple[int, int] = max_size
+        "缩略图的最大宽高"
+
+        self.fmt: str = fmt.upper()
+        "缩略图格式"
+
+        self.quality: int = quality
+        "压缩质量"
+
+        self.memory: LRUCache[tuple[str, int, int], Path] = LRUCache(
+            max_size=memory_size
+        )
+        "(路径, 修改时间, 大小) 到缩略图路径的缓存"
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop: threading.Event = threading.Event()
+
+    def _key(self, path: Path) -> Optional[tuple[str, int, int]]:
+        try:
+            stat: os.stat_result = path.stat()
+        except OSError:
+            return None
+        return (str(path.absolute()), stat.st_mtime_ns, stat.st_size)
+
+    def target(self, key: tuple[str, int, int]) -> Path:
+        """
+        返回缩略图在磁盘上的路径。
+        """
+        digest: str = hashlib.sha1(
+            repr((key, self.max_size, self.fmt, self.quality)).encode("utf-8")
+        ).hexdigest()
+        suffix: str = ".webp" if self.fmt == "WEBP" else ".jpg"
+        return self.cache_dir / digest[:2] / f"{digest}{suffix}"
+
+    def get(self, path: Path) -> Path:
+        """
+        返回 path 的缩略图，不存在时立即生成。无法生成时返回原图。
+        """
+        key: Optional[tuple[str, int, int]] = self._key(path)
+        if key is None:
+            return path
+        cached: Optional[Path] = self.memory.get(key)
+        if cached is not None:
+            return cached
+        target: Path = self.target(key)
+        if not target.is_file():
+            try:
+                generate_preview(path, target, self.max_size, self.fmt, self.quality)
+            except (OSError, ValueError):
+                return path
+        self.memory.put(key, target)
+        return target
+
+    def pregenerate(
+        self, paths: Iterable[Path], workers: Optional[int] = None
+    ) -> threading.Thread:
+        """
+        在后台使用进程池为 paths 生成缩略图，已存在的缩略图会被跳过。
+
+        Parameters:
+            paths (Iterable[Path]): 原图路径，在后台线程中逐个读取。
+            workers (int, optional): 进程数，默认为 CPU 核心数减一。
+
+        Returns:
+            threading.Thread: 后台线程。
+        """
+        workers = workers or max((os.cpu_count() or 2) - 1, 1)
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._stop.clear()
+        executor: ProcessPoolExecutor = self._executor
+
+        def run() -> None:
+            futures: deque[Future] = deque()
+            for path in paths:
+                if self._stop.is_set():
+                    return
+                key: Optional[tuple[str, int, int]] = self._key(path)
+                if key is None or self.target(key).is_file():
+                    continue
+                try:
+                    futures.append(
+                        executor.submit(
+                            generate_preview,
+                            path,
+                            self.target(key),
+                            self.max_size,
+                            self.fmt,
+                            self.quality,
+                        )
+                    )
+                except RuntimeError:
+                    return
+                while len(futures) >= workers * 4:
+                    wait([futures.popleft()])
+            wait(futures)
+
+        self._thread = threading.Thread(target=run, name="PreviewCache", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def close(self) -> None:
+        """
+        停止后台生成。
+        """
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
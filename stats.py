@@ -0,0 +1,507 @@
+"""
+stats.py
+"""
+
+import argparse
+import math
+import sqlite3
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from get_file import SITE_POSITIONS, PicData
+
+SITE_GRID: int = 100
+"拍摄地点的网格：经纬度乘以 SITE_GRID 后向下取整，100 约为 1 公里"
+
+STATS_FIELDS: dict[str, float] = {"temperature": 1.0, "humidity": 5.0}
+"按拍摄地点统计分布的字段及其直方图的区间宽度"
+
+CREATE_TABLE_SQL: dict[str, str] = {
+    "stats_conditions": """
+    CREATE TABLE IF NOT EXISTS stats_conditions (
+        weather TEXT NOT NULL,
+        feature_mask INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (weather, feature_mask)
+    ) WITHOUT ROWID
+    """,
+    "stats_sites": """
+    CREATE TABLE IF NOT EXISTS stats_sites (
+        site TEXT NOT NULL,
+        field TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        total REAL NOT NULL,
+        squares REAL NOT NULL,
+        PRIMARY KEY (site, field, bucket)
+    ) WITHOUT ROWID
+    """,
+    "stats_progress": """
+    CREATE TABLE IF NOT EXISTS stats_progress (
+        status INTEGER PRIMARY KEY,
+        count INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+}
+"""
+聚合表：
+stats_conditions 为天气 × 地物类型掩码的记录数，未设置的天气为 ''，未设置的地物类型为 -1；
+stats_sites 为各拍摄地点各字段的直方图，每个区间记录数、总和与平方和，未设置拍摄位置的地点为 ''；
+stats_progress 为各标注状态的记录数
+"""
+
+
+def _floor(expr: str) -> str:
+    return f"(CAST({expr} AS INTEGER) - ({expr} < CAST({expr} AS INTEGER)))"
+
+
+def _weather(row: str) -> str:
+    return f"coalesce({row}weather, '')"
+
+
+def _mask(row: str) -> str:
+    return f"coalesce({row}feature_mask, -1)"
+
+
+def _site(row: str) -> str:
+    return (
+        f"CASE WHEN {row}longitude IS NULL OR {row}latitude IS NULL "
+        f"OR ({row}longitude = 0 AND {row}latitude = 0) THEN '' "
+        f"ELSE {_floor(f'{row}longitude * {SITE_GRID}')} || ',' "
+        f"|| {_floor(f'{row}latitude * {SITE_GRID}')} END"
+    )
+
+
+def _bucket(row: str, field: str) -> str:
+    return _floor(f"CAST({row}{field} AS REAL) / {STATS_FIELDS[field]}")
+
+
+def _add_condition(row: str) -> str:
+    return (
+        "INSERT INTO stats_conditions (weather, feature_mask, count) "
+        f"VALUES ({_weather(row)}, {_mask(row)}, 1) "
+        "ON CONFLICT DO UPDATE SET count = count + 1;"
+    )
+
+
+def _remove_condition(row: str) -> str:
+    where: str = f"weather = {_weather(row)} AND feature_mask = {_mask(row)}"
+    return (
+        f"UPDATE stats_conditions SET count = count - 1 WHERE {where};"
+        f"DELETE FROM stats_conditions WHERE {where} AND count <= 0;"
+    )
+
+
+def _add_site(row: str, field: str) -> str:
+    value: str = f"{row}{field}"
+    return (
+        "INSERT INTO stats_sites (site, field, bucket, count, total, squares) "
+        f"SELECT {_site(row)}, '{field}', {_bucket(row, field)}, 1, "
+        f"{value}, {value} * {value} WHERE {value} IS NOT NULL "
+        "ON CONFLICT DO UPDATE SET count = count + 1, "
+        "total = total + excluded.total, squares = squares + excluded.squares;"
+    )
+
+
+def _remove_site(row: str, field: str) -> str:
+    value: str = f"{row}{field}"
+    where: str = (
+        f"site = {_site(row)} AND field = '{field}' "
+        f"AND bucket = {_bucket(row, field)}"
+    )
+    return (
+        f"UPDATE stats_sites SET count = count - 1, total = total - {value}, "
+        f"squares = squares - {value} * {value} WHERE {where};"
+        f"DELETE FROM stats_sites WHERE {where} AND count <= 0;"
+    )
+
+
+def _add_progress(row: str) -> str:
+    return (
+        f"INSERT INTO stats_progress (status, count) VALUES ({row}status, 1) "
+        "ON CONFLICT DO UPDATE SET count = count + 1;"
+    )
+
+
+def _remove_progress(row: str) -> str:
+    where: str = f"status = {row}status"
+    return (
+        f"UPDATE stats_progress SET count = count - 1 WHERE {where};"
+        f"DELETE FROM stats_progress WHERE {where} AND count <= 0;"
+    )
+
+
+def _site_trigger(field: str) -> str:
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS stats_sites_{field}_update
+    AFTER UPDATE OF shooting_position, {field} ON records
+    WHEN OLD.shooting_position IS NOT NEW.shooting_position
+        OR OLD.{field} IS NOT NEW.{field}
+    BEGIN
+        {_remove_site("OLD.", field)}
+        {_add_site("NEW.", field)}
+    END
+    """
+
+
+FILL_SQL: dict[str, tuple[str, ...]] = {
+    "stats_conditions": (
+        "INSERT INTO stats_conditions (weather, feature_mask, count) "
+        f"SELECT {_weather('')}, {_mask('')}, COUNT(*) FROM records GROUP BY 1, 2",
+    ),
+    "stats_sites": tuple(
+        "INSERT INTO stats_sites (site, field, bucket, count, total, squares) "
+        f"SELECT {_site('')}, '{field}', {_bucket('', field)}, COUNT(*), "
+        f"SUM({field}), SUM({field} * {field}) FROM records "
+        f"WHERE {field} IS NOT NULL GROUP BY 1, 3"
+        for field in STATS_FIELDS
+    ),
+    "stats_progress": (
+        "INSERT INTO stats_progress (status, count) "
+        "SELECT status, COUNT(*) FROM records GROUP BY status",
+    ),
+}
+"根据 records 表重新计算聚合表"
+
+TRIGGER_SQL: tuple[str, ...] = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS stats_insert AFTER INSERT ON records
+    BEGIN
+        {_add_condition("NEW.")}
+        {"".join(_add_site("NEW.", field) for field in STATS_FIELDS)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS stats_delete AFTER DELETE ON records
+    BEGIN
+        {_remove_condition("OLD.")}
+        {"".join(_remove_site("OLD.", field) for field in STATS_FIELDS)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS stats_conditions_update
+    AFTER UPDATE OF weather, feature ON records
+    WHEN OLD.weather IS NOT NEW.weather OR OLD.feature_mask IS NOT NEW.feature_mask
+    BEGIN
+        {_remove_condition("OLD.")}
+        {_add_condition("NEW.")}
+    END
+    """,
+    *(_site_trigger(field) for field in STATS_FIELDS),
+    f"""
+    CREATE TRIGGER IF NOT EXISTS stats_progress_insert AFTER INSERT ON records
+    BEGIN
+        {_add_progress("NEW.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS stats_progress_delete AFTER DELETE ON records
+    BEGIN
+        {_remove_progress("OLD.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS stats_progress_update AFTER UPDATE OF status ON records
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        {_remove_progress("OLD.")}
+        {_add_progress("NEW.")}
+    END
+    """,
+)
+"保持聚合表与 records 表同步的触发器，GUI 的提交、批量标注和导入都会经过这里"
+
+
+def create_stats(conn: sqlite3.Connection) -> None:
+    """
+    创建聚合表和触发器，不存在的聚合表会根据 records 表填充。
+    依赖 database.EXTRA_COLUMNS 中的列，由 Database.migrate 调用。
+    """
+    for name, create_sql in CREATE_TABLE_SQL.items():
+        if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+        ).fetchone():
+            continue
+        conn.execute(create_sql)
+        for sql in FILL_SQL[name]:
+            conn.execute(sql)
+    for sql in TRIGGER_SQL:
+        conn.execute(sql)
+
+
+def site_name(site: str) -> str:
+    """
+    返回拍摄地点的名称：包含 SITE_POSITIONS 中某个地点的网格返回该地点的名称，
+    其余网格返回其西南角的经纬度，未设置拍摄位置时返回“未知”。
+    """
+    if not site:
+        return "未知"
+    x, y = (int(value) for value in site.split(","))
+    for name, (longitude, latitude) in SITE_POSITIONS.items():
+        if (
+            math.floor(longitude * SITE_GRID) == x
+            and math.floor(latitude * SITE_GRID) == y
+        ):
+            return name
+    return f"{x / SITE_GRID:.2f}, {y / SITE_GRID:.2f}"
+
+
+def condition_stats(conn: sqlite3.Connection) -> list[tuple[str, int, int]]:
+    """
+    读取天气 × 地物类型的记录数。
+
+    Returns:
+        list[tuple[str, int, int]]: (天气, 地物类型掩码, 记录数)，掩码为 -1 表示未设置。
+    """
+    return conn.execute(
+        "SELECT weather, feature_mask, count FROM stats_conditions "
+        "ORDER BY weather, feature_mask"
+    ).fetchall()
+
+
+def progress_stats(conn: sqlite3.Connection) -> dict[int, int]:
+    """
+    读取各标注状态的记录数。
+
+    Returns:
+        dict[int, int]: 标注状态到记录数的映射，状态的取值见 database.STATUS_ANNOTATED。
+    """
+    return dict(conn.execute("SELECT status, count FROM stats_progress").fetchall())
+
+
+def site_stats(
+    conn: sqlite3.Connection,
+) -> list[tuple[str, str, int, float, float, float, float]]:
+    """
+    由直方图汇总各拍摄地点各字段的分布，只读取聚合表。
+
+    Returns:
+        list[tuple[str, str, int, float, float, float, float]]:
+            (地点, 字段, 记录数, 平均值, 标准差, 最小值, 最大值)，
+            最小值和最大值精确到直方图的区间。
+    """
+    result: list[tuple[str, str, int, float, float, float, float]] = []
+    for site, field, count, total, squares, low, high in conn.execute(
+        "SELECT site, field, SUM(count), SUM(total), SUM(squares), "
+        "MIN(bucket), MAX(bucket) FROM stats_sites GROUP BY site, field "
+        "ORDER BY site, field"
+    ):
+        mean: float = total / count
+        width: float = STATS_FIELDS.get(field, 1.0)
+        result.append(
+            (
+                site,
+                field,
+                count,
+                mean,
+                math.sqrt(max(0.0, squares / count - mean * mean)),
+                low * width,
+                (high + 1) * width,
+            )
+        )
+    return result
+
+
+def histogram(
+    conn: sqlite3.Connection, site: str, field: str
+) -> list[tuple[float, int]]:
+    """
+    读取拍摄地点 site 的 field 字段的直方图。
+
+    Returns:
+        list[tuple[float, int]]: (区间下界, 记录数)。
+    """
+    width: float = STATS_FIELDS[field]
+    return [
+        (bucket * width, count)
+        for bucket, count in conn.execute(
+            "SELECT bucket, count FROM stats_sites WHERE site = ? AND field = ? "
+            "ORDER BY bucket",
+            (site, field),
+        )
+    ]
+
+
+def compute_stats(
+    conn: sqlite3.Connection,
+) -> tuple[
+    dict[tuple[str, int], int],
+    dict[tuple[str, str, int], tuple[int, float, float]],
+    dict[int, int],
+]:
+    """
+    读取 records 表的相关列，用 NumPy 向量化地重新计算全部聚合结果，用于校验聚合表。
+
+    Returns:
+        tuple: 与 stats_conditions、stats_sites 和 stats_progress 对应的三个字典：
+            (天气, 地物类型掩码) -> 记录数，
+            (地点, 字段, 区间) -> (记录数, 总和, 平方和)，
+            标注状态 -> 记录数。
+    """
+    columns: list[tuple] = list(
+        zip(
+            *conn.execute(
+                f"SELECT {_weather('')}, {_mask('')}, longitude, latitude, status, "
+                f"{', '.join(STATS_FIELDS)} FROM records"
+            )
+        )
+    )
+    if not columns:
+        return ({}, {}, {})
+    weather: np.ndarray = np.array(columns[0], dtype=str)
+    mask: np.ndarray = np.array(columns[1], dtype=np.int64)
+    longitude: np.ndarray = np.array(columns[2], dtype=float)
+    latitude: np.ndarray = np.array(columns[3], dtype=float)
+    status: np.ndarray = np.array(columns[4], dtype=np.int64)
+
+    names, weather_index = np.unique(weather, return_inverse=True)
+    masks, mask_index = np.unique(mask, return_inverse=True)
+    counts: np.ndarray = np.bincount(
+        weather_index * len(masks) + mask_index, minlength=len(names) * len(masks)
+    )
+    conditions: dict[tuple[str, int], int] = {
+        (str(names[i // len(masks)]), int(masks[i % len(masks)])): int(counts[i])
+        for i in np.flatnonzero(counts)
+    }
+
+    located: np.ndarray = (
+        ~np.isnan(longitude)
+        & ~np.isnan(latitude)
+        & ~((longitude == 0) & (latitude == 0))
+    )
+    cells: np.ndarray = np.zeros((len(weather), 2), dtype=np.int64)
+    cells[located, 0] = np.floor(longitude[located] * SITE_GRID)
+    cells[located, 1] = np.floor(latitude[located] * SITE_GRID)
+    sites: list[str] = [
+        f"{x},{y}" if ok else "" for (x, y), ok in zip(cells.tolist(), located.tolist())
+    ]
+    site_array: np.ndarray = np.array(sites, dtype=str)
+
+    distribution: dict[tuple[str, str, int], tuple[int, float, float]] = {}
+    for offset, (field, width) in enumerate(STATS_FIELDS.items()):
+        values: np.ndarray = np.array(columns[5 + offset], dtype=float)
+        valid: np.ndarray = ~np.isnan(values)
+        values = values[valid]
+        buckets: np.ndarray = np.floor(values / width).astype(np.int64)
+        site_names, site_index = np.unique(site_array[valid], return_inverse=True)
+        keys, index = np.unique(
+            np.stack([site_index, buckets], axis=1), axis=0, return_inverse=True
+        )
+        index = index.reshape(-1)
+        count: np.ndarray = np.bincount(index, minlength=len(keys))
+        total: np.ndarray = np.bincount(index, weights=values, minlength=len(keys))
+        squares: np.ndarray = np.bincount(
+            index, weights=values * values, minlength=len(keys)
+        )
+        for i, (site, bucket) in enumerate(keys.tolist()):
+            distribution[(str(site_names[site]), field, bucket)] = (
+                int(count[i]),
+                float(total[i]),
+                float(squares[i]),
+            )
+    statuses, status_counts = np.unique(status, return_counts=True)
+    progress: dict[int, int] = dict(zip(statuses.tolist(), status_counts.tolist()))
+    return (conditions, distribution, progress)
+
+
+def verify_stats(conn: sqlite3.Connection) -> list[str]:
+    """
+    用 compute_stats 的结果校验聚合表。
+
+    Returns:
+        list[str]: 不一致之处的描述，为空表示一致。总和与平方和按相对误差 1e-9 比较。
+    """
+    conditions, distribution, progress = compute_stats(conn)
+    errors: list[str] = []
+    stored: dict[tuple, Any] = {
+        (weather, mask): count for weather, mask, count in condition_stats(conn)
+    }
+    for key in sorted(set(stored) | set(conditions), key=str):
+        if stored.get(key) != conditions.get(key):
+            errors.append(
+                f"stats_conditions {key}: {stored.get(key)} != {conditions.get(key)}"
+            )
+    stored = {
+        (site, field, bucket): (count, total, squares)
+        for site, field, bucket, count, total, squares in conn.execute(
+            "SELECT site, field, bucket, count, total, squares FROM stats_sites"
+        )
+    }
+    for key in sorted(set(stored) | set(distribution), key=str):
+        actual: Optional[tuple] = stored.get(key)
+        expected: Optional[tuple] = distribution.get(key)
+        if (
+            actual is None
+            or expected is None
+            or actual[0] != expected[0]
+            or not np.allclose(actual[1:], expected[1:], rtol=1e-9)
+        ):
+            errors.append(f"stats_sites {key}: {actual} != {expected}")
+    stored = progress_stats(conn)
+    if stored != progress:
+        errors.append(f"stats_progress: {stored} != {progress}")
+    return errors
+
+
+def rebuild_stats(conn: sqlite3.Connection) -> None:
+    """
+    清空并重新计算聚合表。
+    """
+    with conn:
+        for name, fill_sql in FILL_SQL.items():
+            conn.execute(f"DELETE FROM {name}")
+            for sql in fill_sql:
+                conn.execute(sql)
+
+
+def print_stats(conn: sqlite3.Connection) -> None:
+    """
+    打印聚合表的内容。
+    """
+    print("天气 × 地物类型：")
+    for weather, mask, count in condition_stats(conn):
+        feature: Optional[list[str]] = PicData.mask_to_feature(mask)
+        print(
+            f"  {weather or '未设置'}\t"
+            f"{'未设置' if feature is None else ','.join(feature) or '无'}\t{count}"
+        )
+    print("拍摄地点分布：")
+    for site, field, count, mean, std, low, high in site_stats(conn):
+        print(
+            f"  {site_name(site)}\t{field}\t{count}\t"
+            f"平均 {mean:.2f}\t标准差 {std:.2f}\t范围 [{low:g}, {high:g})"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查看数据集的统计信息")
+    parser.add_argument(
+        "--database", type=Path, default=Path("./database.db"), help="数据库文件"
+    )
+    parser.add_argument(
+        "--verify", action="store_true", help="用 NumPy 全量重新计算并校验聚合表"
+    )
+    parser.add_argument("--rebuild", action="store_true", help="重新计算聚合表")
+    args = parser.parse_args()
+
+    from database import Database
+
+    _db: Database = Database(database_file=args.database)
+    _conn: sqlite3.Connection = _db.connection()
+    if args.rebuild:
+        rebuild_stats(_conn)
+    _annotated, _total = _db.progress()
+    print(f"标注进度：{_annotated} / {_total}")
+    print_stats(_conn)
+    if args.verify:
+        _errors: list[str] = verify_stats(_conn)
+        for _error in _errors:
+            print(_error)
+        print(
+            "聚合表与 records 表一致"
+            if not _errors
+            else f"发现 {len(_errors)} 处不一致"
+        )
+    _db.close()
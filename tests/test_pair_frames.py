@@ -0,0 +1,104 @@
+"""
+pair_frames 的配对测试
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from get_file import pair_frames  # pylint: disable=wrong-import-position
+
+
+def frame(name: str, time_stamp: str = "") -> dict:
+    """
+    返回 yield_info 格式的图像信息，时间戳默认从 DJI 文件名中读取。
+    """
+    if not time_stamp and name.startswith("DJI_"):
+        digits = name.split("_")[1]
+        time_stamp = (
+            f"{digits[:4]}-{digits[4:6]}-{digits[6:8]} "
+            f"{digits[8:10]}:{digits[10:12]}:{digits[12:14]}"
+        )
+    return {
+        "file": Path("images") / name,
+        "time_stamp": time_stamp,
+        "weather": "",
+        "temperature": "",
+        "img_type": "IR" if name.split(".")[0].endswith("_T") else "NR",
+    }
+
+
+def names(pair_dict: dict) -> list[tuple[str, str]]:
+    return [(pair.original.name, pair.processed.name) for pair in pair_dict.values()]
+
+
+def test_offset_interval_sequence():
+    # 间隔拍摄：红外图像的时间戳整体比可见光图像晚 1 秒
+    infos = []
+    for sequence, second in enumerate(range(10, 14)):
+        infos.append(frame(f"DJI_202305011000{second:02d}_{sequence:04d}_V.jpg"))
+        infos.append(frame(f"DJI_202305011000{second + 1:02d}_{sequence:04d}_T.jpg"))
+    pair_dict, unmatched = pair_frames(infos, tolerance=1)
+    assert names(pair_dict) == [
+        (
+            f"DJI_202305011000{second:02d}_{sequence:04d}_V.jpg",
+            f"DJI_202305011000{second + 1:02d}_{sequence:04d}_T.jpg",
+        )
+        for sequence, second in enumerate(range(10, 14))
+    ]
+    assert not unmatched
+
+
+def test_offset_without_sequence_prefers_nearest():
+    infos = [
+        frame("V1.jpg", "2023-05-01 10:00:10"),
+        frame("IR1.jpg", "2023-05-01 10:00:11") | {"img_type": "IR"},
+        frame("IR2.jpg", "2023-05-01 10:00:10") | {"img_type": "IR"},
+    ]
+    pair_dict, unmatched = pair_frames(infos, tolerance=1)
+    assert names(pair_dict) == [("V1.jpg", "IR2.jpg")]
+    assert [info["file"].name for info in unmatched] == ["IR1.jpg"]
+
+
+def test_same_timestamp_collision_is_reported():
+    infos = [
+        frame("DJI_20230501100000_0001_V.jpg"),
+        frame("DJI_20230501100000_0001_S.jpg"),
+        frame("DJI_20230501100000_0001_T.jpg"),
+    ]
+    pair_dict, unmatched = pair_frames(infos, tolerance=1)
+    assert len(pair_dict) == 1
+    paired = next(iter(pair_dict.values()))
+    assert paired.processed.name == "DJI_20230501100000_0001_T.jpg"
+    # 落选的一张可见光图像不能被丢弃
+    assert len(unmatched) == 1
+    assert {paired.original.name, unmatched[0]["file"].name} == {
+        "DJI_20230501100000_0001_V.jpg",
+        "DJI_20230501100000_0001_S.jpg",
+    }
+
+
+def test_two_pairs_in_one_second_are_kept():
+    infos = [
+        frame("DJI_20230501100000_0001_V.jpg"),
+        frame("DJI_20230501100000_0002_V.jpg"),
+        frame("DJI_20230501100000_0002_T.jpg"),
+        frame("DJI_20230501100000_0001_T.jpg"),
+    ]
+    pair_dict, unmatched = pair_frames(infos, tolerance=0)
+    assert names(pair_dict) == [
+        ("DJI_20230501100000_0001_V.jpg", "DJI_20230501100000_0001_T.jpg"),
+        ("DJI_20230501100000_0002_V.jpg", "DJI_20230501100000_0002_T.jpg"),
+    ]
+    assert not unmatched
+
+
+def test_frames_without_timestamp_are_reported():
+    infos = [frame("notes.jpg"), frame("DJI_20230501100000_0001_V.jpg")]
+    pair_dict, unmatched = pair_frames(infos, tolerance=1)
+    assert not pair_dict
+    assert sorted(info["file"].name for info in unmatched) == [
+        "DJI_20230501100000_0001_V.jpg",
+        "notes.jpg",
+    ]